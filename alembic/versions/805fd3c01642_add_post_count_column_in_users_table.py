@@ -0,0 +1,63 @@
+"""add post_count column in users table.
+
+Revision ID: 805fd3c01642
+Revises: 73f5b346730e
+Create Date: 2026-10-18 11:02:41.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '805fd3c01642'
+down_revision: Union[str, Sequence[str], None] = '73f5b346730e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same triggers as post_count.py (copied here, so this migration doesn't change if that file changes later).
+TRIGGERS = {
+    "posts_post_count_insert": """
+        CREATE TRIGGER posts_post_count_insert AFTER INSERT ON posts
+        BEGIN
+            UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+        END
+    """,
+    "posts_post_count_delete": """
+        CREATE TRIGGER posts_post_count_delete AFTER DELETE ON posts
+        BEGIN
+            UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+        END
+    """,
+    "posts_post_count_update": """
+        CREATE TRIGGER posts_post_count_update AFTER UPDATE OF user_id ON posts
+        WHEN OLD.user_id != NEW.user_id
+        BEGIN
+            UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+            UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("post_count", sa.Integer, nullable=False, server_default="0"))
+    op.create_index("ix_users_post_count", "users", ["post_count"])
+
+    # backfill the counts for the existing posts.
+    op.execute("UPDATE users SET post_count = (SELECT count(*) FROM posts WHERE posts.user_id = users.id)")
+
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    op.drop_index("ix_users_post_count", table_name="users")
+    op.drop_column("users", "post_count")
@@ -0,0 +1,28 @@
+"""add indexes on posts user_id.
+
+Revision ID: c4e1a9d27b53
+Revises: 805fd3c01642
+Create Date: 2026-10-18 14:27:09.380112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a9d27b53'
+down_revision: Union[str, Sequence[str], None] = '805fd3c01642'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # serves WHERE posts.user_id = ? / IN (...) lookups (posts of a user, lazy / selectin load of User.posts).
+    op.create_index("ix_posts_user_id", "posts", ["user_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_user_id", table_name="posts")
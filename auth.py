@@ -1,8 +1,14 @@
+import hashlib
+import hmac
+import os
 import secrets
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
+from cache import TTLCache
+from bcrypt_pool import BcryptPool, PoolFullError
+from metrics import span
 
 security_app = HTTPBasic()
 
@@ -30,39 +36,120 @@ def verify_password(input_password, db_password):
 def get_bcrypt_password(input_password):
     return bcrypt_lib.hash(input_password)
 
+# Verified credentials cache
+# HTTP Basic sends the password on every request, and bcrypt verify takes ~250ms of CPU.
+# So after a successful verify we remember it for some time and skip bcrypt for the same username + password.
+# The key is an HMAC of username + password with a random per-process secret,
+# so the cache never holds the plain password (or a hash which can be brute forced offline).
+_credential_cache_secret = secrets.token_bytes(32)
+verified_credentials = TTLCache(
+    maxsize=int(os.environ.get("AUTH_CACHE_SIZE", "1024")),
+    ttl=int(os.environ.get("AUTH_CACHE_TTL", "300"))
+)
+
+def _credential_digest(username, password):
+    message = username.encode() + b"\0" + password.encode()
+    return hmac.new(_credential_cache_secret, message, hashlib.sha256).digest()
+
+def forget_verified_credentials(username):
+    verified_credentials.delete_where(lambda value: value[0] == username)
+
+# Async versions: bcrypt runs in its own worker pool (see bcrypt_pool.py), not in FastAPI's threadpool.
+bcrypt_pool = BcryptPool(
+    max_workers=int(os.environ.get("BCRYPT_WORKERS", "0")) or None,
+    max_queue=int(os.environ.get("BCRYPT_MAX_QUEUE", "64"))
+)
+
+async def _run_in_bcrypt_pool(fn, *args):
+    try:
+        return await bcrypt_pool.run(fn, *args)
+    except PoolFullError:
+        # 503 - server is busy, client can retry after some time.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login requests, please try again.",
+            headers={"Retry-After": "1"}
+        )
 
-def sign_up(input_user_object: User):
+async def verify_password_async(input_password, db_password):
+    return await _run_in_bcrypt_pool(verify_password, input_password, db_password)
+
+async def get_bcrypt_password_async(input_password):
+    return await _run_in_bcrypt_pool(get_bcrypt_password, input_password)
+
+
+def _save_db_user(input_user_object: User, hashed_password):
     db_user_dict = {}
     db_user_dict["username"] = input_user_object.username
     db_user_dict["name"] = input_user_object.name
     db_user_dict["email"] = input_user_object.email
-
-    hashed_password = get_bcrypt_password(input_user_object.password)
     db_user_dict["password"] = hashed_password
 
     fake_users_db[input_user_object.username] = db_user_dict
+    # password changed -> the old password must not work from the cache anymore.
+    forget_verified_credentials(input_user_object.username)
 
+def sign_up(input_user_object: User):
+    hashed_password = get_bcrypt_password(input_user_object.password)
+    _save_db_user(input_user_object, hashed_password)
 
-def authenticate_user(user_details: HTTPBasicCredentials = Depends(security_app)):
-    username = user_details.username
-    user = fake_users_db[username]
+async def sign_up_async(input_user_object: User):
+    hashed_password = await get_bcrypt_password_async(input_user_object.password)
+    _save_db_user(input_user_object, hashed_password)
 
+
+def _get_db_user(username):
     if username not in fake_users_db:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username not found, please login first."
         )
-    
+    return fake_users_db[username]
+
+# Same username + password verified recently (and the password hash is still the same) -> skip bcrypt.
+def _is_recently_verified(digest, user):
+    cached = verified_credentials.get(digest)
+    return cached is not None and hmac.compare_digest(cached[1], user["password"])
+
+def _invalid_credentials():
+    return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Credentials!"
+        )
+
+def authenticate_user(user_details: HTTPBasicCredentials = Depends(security_app)):
+    username = user_details.username
+    user = _get_db_user(username)
+
+    digest = _credential_digest(username, user_details.password)
+    if _is_recently_verified(digest, user):
+        return username
+
     # username found in db, compare the password now.
     if verify_password(user_details.password, user["password"]):
         #Login successful
+        verified_credentials.set(digest, (username, user["password"]))
         # Instead of returning username here, we should return the Token via JWT Library
         return username
     
-    raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid Credentials!"
-        )
+    raise _invalid_credentials()
+
+# async dependency -> FastAPI awaits it on the event loop, the bcrypt work goes to bcrypt_pool.
+async def authenticate_user_async(user_details: HTTPBasicCredentials = Depends(security_app)):
+    # span -> /metrics shows how much of a request goes into the password check.
+    with span("auth"):
+        username = user_details.username
+        user = _get_db_user(username)
+
+        digest = _credential_digest(username, user_details.password)
+        if _is_recently_verified(digest, user):
+            return username
+
+        if await verify_password_async(user_details.password, user["password"]):
+            verified_credentials.set(digest, (username, user["password"]))
+            return username
+
+        raise _invalid_credentials()
 
 
 # def authenticate_user(user_details: HTTPBasicCredentials = Depends(security_app)): 
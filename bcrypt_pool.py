@@ -0,0 +1,82 @@
+# Dedicated worker pool for bcrypt hashing / verification.
+# bcrypt is CPU heavy (~250ms per call). If it runs in FastAPI's default threadpool,
+# a burst of logins takes all the threads and the other sync endpoints have to wait.
+# With its own pool the auth load is isolated: at most max_workers bcrypt calls run at a time,
+# at most max_queue calls wait, anything beyond that is rejected straight away.
+# The bcrypt library releases the GIL while hashing, so threads do use multiple cores.
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolFullError(Exception):
+    pass
+
+
+class BcryptPool:
+    def __init__(self, max_workers=None, max_queue=64):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+
+        # metrics
+        self.queued = 0 # submitted, waiting for a free worker (queue depth)
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0 # total time spent in the queue
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PoolFullError("bcrypt queue is full")
+            self.queued += 1
+
+        try:
+            future = self._executor.submit(self._run, fn, args, time.perf_counter())
+        except BaseException: # executor already shut down
+            with self._lock:
+                self.queued -= 1
+            raise
+        # A job that never starts (the awaiting request was cancelled - client gone, timeout - or
+        # shutdown(cancel_futures=True)) never gets to _run, so it leaves the queue here instead.
+        # A job that already started can't be cancelled, _run does the counting for it.
+        future.add_done_callback(self._leave_queue_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _leave_queue_if_cancelled(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    # queued -> running only once a worker actually picks the job up.
+    def _run(self, fn, args, submitted_at):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += time.perf_counter() - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds": self.wait_seconds,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,3 @@
+# Benchmarks for the students API and the CRUD layers.
+# Run them from the repository root, e.g. python -m benchmarks.bench_serialization
+# python -m benchmarks.run runs every suite (bench_api, bench_crud core + orm) and can compare with a baseline.
@@ -0,0 +1,119 @@
+# Load test of the students API (main.app), in-process through httpx's ASGI transport:
+# no server / network in the way, so the numbers are the app's own cost (routing, auth, store, JSON).
+# python -m benchmarks.bench_api --students 100000 --requests 2000 --concurrency 16
+#
+# The app runs on a temp copy of a synthetic roster (STUDENTS_FILE), students.json is never touched.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+import httpx
+import orjson
+from benchmarks.synthetic import make_roster
+from benchmarks.stats import summarize, peak_rss_mb
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+# every created student needs an id which is not taken yet (also across the warmup runs).
+_new_student_ids = itertools.count(1)
+
+# scenario name -> function(call no., rng, student ids) returning the request (method, url, kwargs).
+SCENARIOS = {
+    "get_student": lambda i, rng, ids: ("GET", f"/students/{rng.choice(ids)}", {}),
+    "sort_page": lambda i, rng, ids: ("GET", f"/sort?sort_by=problems_solved&order=desc&limit=50&offset={rng.randint(0, 1000)}", {}),
+    "students_page_auth": lambda i, rng, ids: ("GET", "/students?limit=100", {"auth": (BENCH_USERNAME, BENCH_PASSWORD)}),
+    "update_student": lambda i, rng, ids: ("PUT", f"/update/{rng.choice(ids)}", {"json": {"problems_solved": rng.randint(0, 150)}}),
+    "create_student": lambda i, rng, ids: ("POST", "/create", {"json": {
+        "id": f"BENCH{next(_new_student_ids):07d}", "name": "Bench", "city": "Pune", "batch": "AI 2025",
+        "age": 21, "problems_solved": rng.randint(0, 150), "passout_year": 2025}}),
+}
+
+# Writes the roster to a temp folder and points the app's settings at it.
+# Must run before main is imported, the settings are read at import time.
+def prepare_environment(students, backend):
+    folder = tempfile.mkdtemp(prefix="students-bench-")
+    path = os.path.join(folder, "students.json")
+    roster = make_roster(students)
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(roster))
+
+    os.environ["STUDENTS_FILE"] = path
+    os.environ["STUDENTS_BACKEND"] = backend
+    os.environ["STUDENTS_DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "students.db")
+    return roster
+
+async def run_scenario(client, name, requests, concurrency, ids, seed):
+    make_request = SCENARIOS[name]
+    rng = random.Random(seed)
+    calls = iter(range(requests))
+    latencies, errors = [], 0
+
+    # `concurrency` workers, each one sends its next request as soon as the previous one is answered.
+    async def worker():
+        nonlocal errors
+        for i in calls:
+            method, url, kwargs = make_request(i, rng, ids)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+async def run_all(app, scenarios, requests, concurrency, ids, seed):
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in scenarios:
+            # a few untimed requests first (bcrypt for the first authenticated call, response cache, ...).
+            await run_scenario(client, name, min(10, requests), 1, ids, seed + 1)
+            results[name] = await run_scenario(client, name, requests, concurrency, ids, seed)
+    return results
+
+def run(students, requests, concurrency, backend="json", scenarios=None, seed=42):
+    roster = prepare_environment(students, backend)
+
+    import auth
+    import main
+
+    if backend != "json": # the sqlite backend starts empty.
+        main.store.put_many(roster)
+    auth.fake_users_db[BENCH_USERNAME] = {
+        "username": BENCH_USERNAME, "name": "Bench", "email": "bench@example.com",
+        "password": auth.get_bcrypt_password(BENCH_PASSWORD),
+    }
+
+    ids = list(roster)
+    del roster
+    try:
+        cases = asyncio.run(run_all(main.app, scenarios or list(SCENARIOS), requests, concurrency, ids, seed))
+    finally:
+        main.store.close()
+        auth.bcrypt_pool.shutdown()
+
+    return {
+        "suite": "api",
+        "params": {"students": students, "requests": requests, "concurrency": concurrency, "backend": backend},
+        "peak_rss_mb": peak_rss_mb(),
+        "cases": cases,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process load test of the students API.")
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="run only these (repeatable)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.students, args.requests, args.concurrency, args.backend, args.scenario), indent=2))
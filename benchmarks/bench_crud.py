@@ -0,0 +1,107 @@
+# Micro-benchmarks of the CRUD functions, Core (crud_operations) or ORM (crud_operations_orm),
+# on a temp SQLite database filled with synthetic users + posts.
+# python -m benchmarks.bench_crud --layer core --users 10000 --posts-per-user 10 --repeat 500
+#
+# One layer per process: both layers bind to DATABASE_URL at import time and create the
+# users table differently (Core has address + phone_number), so benchmarks/run.py starts one process each.
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.synthetic import make_users, make_posts
+from benchmarks.stats import summarize, time_calls, peak_rss_mb
+
+# Must run before db.py is imported, DATABASE_URL is read at import time.
+def prepare_environment():
+    folder = tempfile.mkdtemp(prefix="crud-bench-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "bench.db")
+
+# one call per batch of rows -> latency per batch, rps = batches per second.
+def time_bulk_insert(bulk_create, rows, batch_size):
+    ids, latencies = [], []
+    batch = []
+    started = time.perf_counter()
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            start = time.perf_counter()
+            ids.extend(bulk_create(batch, batch_size))
+            latencies.append(time.perf_counter() - start)
+            batch = []
+    if batch:
+        start = time.perf_counter()
+        ids.extend(bulk_create(batch, batch_size))
+        latencies.append(time.perf_counter() - start)
+    summary = summarize(latencies, time.perf_counter() - started)
+    summary["rows_per_s"] = round(len(ids) / sum(latencies), 1)
+    return ids, summary
+
+def run_core(users, posts_per_user, repeat, batch_size, seed):
+    import tables
+    import crud_operations as crud
+
+    tables.create_tables()
+    cases = {}
+    user_ids, cases["bulk_create_users"] = time_bulk_insert(crud.bulk_create_users, make_users(users, seed), batch_size)
+    _, cases["bulk_create_posts"] = time_bulk_insert(crud.bulk_create_posts, make_posts(user_ids, posts_per_user, seed), batch_size)
+
+    rng = random.Random(seed)
+    pick = lambda i: rng.choice(user_ids)
+    cases["get_user_by_id"] = time_calls(lambda i: crud.get_user_by_id(pick(i)), repeat) # read-through cache
+    cases["load_user_by_id_uncached"] = time_calls(lambda i: crud._load_user_by_id(pick(i)), repeat)
+    cases["get_posts_by_user_id"] = time_calls(lambda i: crud.get_posts_by_user_id(pick(i)), repeat)
+    cases["update_user_name"] = time_calls(lambda i: crud.update_user_name(pick(i), f"Renamed {i}"), repeat)
+    # full table reads, fewer rounds.
+    full = max(1, repeat // 50)
+    cases["get_post_count_per_user"] = time_calls(lambda i: crud.get_post_count_per_user(), full, warmup=1)
+    cases["get_posts_with_author_name"] = time_calls(lambda i: crud.get_posts_with_author_name(), full, warmup=1)
+    cases["iter_all_users"] = time_calls(lambda i: sum(1 for _ in crud.iter_all_users()), full, warmup=1)
+    return cases
+
+def run_orm(users, posts_per_user, repeat, batch_size, seed):
+    import models_orm
+    import crud_operations_orm as crud
+
+    models_orm.create_tables()
+    cases = {}
+    user_ids, cases["bulk_create_users"] = time_bulk_insert(crud.bulk_create_users, make_users(users, seed, core=False), batch_size)
+    _, cases["bulk_create_posts"] = time_bulk_insert(crud.bulk_create_posts, make_posts(user_ids, posts_per_user, seed), batch_size)
+
+    rng = random.Random(seed)
+    pick = lambda i: rng.choice(user_ids)
+    cases["get_user_by_id"] = time_calls(lambda i: crud.get_user_by_id(pick(i)), repeat) # read-through cache
+    cases["load_user_by_id_uncached"] = time_calls(lambda i: crud._load_user_by_id(pick(i)), repeat)
+    cases["get_all_posts_by_user_id"] = time_calls(lambda i: crud.get_all_posts_by_user_id(pick(i)), repeat)
+    cases["get_user_with_posts_selectin"] = time_calls(lambda i: crud.get_user_with_posts(pick(i), "selectin"), repeat)
+    cases["get_user_with_posts_joined"] = time_calls(lambda i: crud.get_user_with_posts(pick(i), "joined"), repeat)
+    # 100 users at a time.
+    some_users = lambda i: rng.sample(user_ids, min(100, len(user_ids)))
+    cases["get_users_with_posts_100"] = time_calls(lambda i: crud.get_users_with_posts(some_users(i)), max(1, repeat // 10))
+    cases["get_posts_for_users_100"] = time_calls(lambda i: crud.get_posts_for_users(some_users(i)), max(1, repeat // 10))
+    return cases
+
+LAYERS = {"core": run_core, "orm": run_orm}
+
+def run(layer, users, posts_per_user, repeat, batch_size=1000, seed=42):
+    prepare_environment()
+    cases = LAYERS[layer](users, posts_per_user, repeat, batch_size, seed)
+    return {
+        "suite": f"crud_{layer}",
+        "params": {"users": users, "posts_per_user": posts_per_user, "repeat": repeat, "batch_size": batch_size},
+        "peak_rss_mb": peak_rss_mb(),
+        "cases": cases,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the CRUD functions.")
+    parser.add_argument("--layer", choices=list(LAYERS), default="core")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=500, help="calls per single-row case")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.layer, args.users, args.posts_per_user, args.repeat, args.batch_size), indent=2))
@@ -0,0 +1,64 @@
+# json vs orjson on a synthetic roster: dumps / loads of the payload and students.json file I/O.
+# python -m benchmarks.bench_serialization --students 100000
+import argparse
+import json
+import os
+import tempfile
+import time
+import orjson
+from benchmarks.synthetic import make_roster
+
+# best of `repeat` runs, in milliseconds.
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def run(n, repeat):
+    roster = make_roster(n)
+    json_bytes = json.dumps(roster).encode()
+    orjson_bytes = orjson.dumps(roster)
+    path = os.path.join(tempfile.mkdtemp(), "students.json")
+
+    def json_write():
+        with open(path, 'w') as f:
+            json.dump(roster, f)
+
+    def orjson_write():
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(roster))
+
+    def json_read():
+        with open(path, 'r') as f:
+            json.load(f)
+
+    def orjson_read():
+        with open(path, 'rb') as f:
+            orjson.loads(f.read())
+
+    cases = {
+        # what FastAPI's JSONResponse does for a dict response.
+        "dumps": (lambda: json.dumps(roster, ensure_ascii=False, separators=(",", ":")).encode(), lambda: orjson.dumps(roster)),
+        "loads": (lambda: json.loads(json_bytes), lambda: orjson.loads(orjson_bytes)),
+        "file write": (json_write, orjson_write),
+        "file read": (json_read, orjson_read),
+    }
+
+    results = {"students": n, "payload_bytes": len(orjson_bytes), "cases": {}}
+    for name, (json_fn, orjson_fn) in cases.items():
+        json_ms = best_ms(json_fn, repeat)
+        orjson_ms = best_ms(orjson_fn, repeat)
+        results["cases"][name] = {"json_ms": round(json_ms, 2), "orjson_ms": round(orjson_ms, 2), "speedup": round(json_ms / orjson_ms, 2)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="json vs orjson for student payloads.")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.students, args.repeat), indent=2))
@@ -0,0 +1,156 @@
+# Runs all the benchmark suites and prints one JSON report.
+# Every suite runs in its own process, so peak RSS is per suite and the suites don't share module state.
+# Each suite runs --rounds times (default 5), round-robin (api, core, orm, api, ...) so a slow minute of
+# the machine hits every suite a bit instead of all the rounds of one suite.
+# The report keeps the median of the rounds for every number, plus the best round ("best": lowest latency,
+# highest rps) of every case.
+#
+# python -m benchmarks.run --save baseline.json                 -> run + keep the report as the baseline
+# python -m benchmarks.run --compare baseline.json              -> run + exit code 1 if anything got slower
+# python -m benchmarks.run --students 1000000 --suite api      -> one suite, bigger roster
+#
+# A case counts as a regression when its p50 / p95 latency grows, or its rps drops, by more than
+# --tolerance (default 25%), or the suite's peak RSS grows by more than that.
+# The current run's *best* round is compared with the baseline's *median*: noise on a busy machine only ever
+# makes a round slower, so when even the best round is that much slower, the code got slower.
+# Latency changes below --min-delta-ms are ignored, sub-millisecond cases are mostly noise,
+# and cases with fewer than --min-samples timed calls (e.g. one bulk insert batch) are only reported, not compared.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def suite_commands(args):
+    return {
+        "api": ["benchmarks.bench_api", "--students", args.students, "--requests", args.requests,
+                "--concurrency", args.concurrency, "--backend", args.backend],
+        "crud_core": ["benchmarks.bench_crud", "--layer", "core", "--users", args.users,
+                      "--posts-per-user", args.posts_per_user, "--repeat", args.repeat],
+        "crud_orm": ["benchmarks.bench_crud", "--layer", "orm", "--users", args.users,
+                     "--posts-per-user", args.posts_per_user, "--repeat", args.repeat],
+    }
+
+def run_suite(command):
+    completed = subprocess.run([sys.executable, "-m", *map(str, command)], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"benchmark {command[0]} failed with exit code {completed.returncode}")
+    return json.loads(completed.stdout)
+
+# several results of the same suite -> one result with the median of every number (+ the best round per case).
+def merge_rounds(results):
+    merged = {key: value for key, value in results[0].items() if key != "cases"}
+    merged["rounds"] = len(results)
+    rss = [r["peak_rss_mb"] for r in results if r["peak_rss_mb"] is not None]
+    merged["peak_rss_mb"] = statistics.median(rss) if rss else None
+    merged["cases"] = {}
+    for case, numbers in results[0]["cases"].items():
+        rounds = [r["cases"][case] for r in results]
+        case_result, best = dict(numbers), {}
+        for metric, value in numbers.items():
+            if value is None or metric in ("count", "errors"):
+                continue
+            values = [n[metric] for n in rounds]
+            case_result[metric] = round(statistics.median(values), 4)
+            best[metric] = max(values) if metric in ("rps", "rows_per_s") else min(values)
+        case_result["errors"] = max(n["errors"] for n in rounds)
+        case_result["best"] = best
+        merged["cases"][case] = case_result
+    return merged
+
+def run_suites(commands, suites, rounds):
+    results = {suite: [] for suite in suites}
+    for _ in range(rounds):
+        for suite in suites:
+            results[suite].append(run_suite(commands[suite]))
+    return {suite: merge_rounds(suite_results) for suite, suite_results in results.items()}
+
+# -> list of regressions, e.g. {"suite": "api", "case": "sort_page", "metric": "p95_ms", "baseline": 1.2, "current": 2.0}
+def compare(report, baseline, tolerance, min_delta_ms, min_samples=20, skipped=None):
+    regressions = []
+
+    def regressed(suite, case, metric, old, new, worse):
+        if old is None or new is None:
+            return
+        if worse(old, new):
+            change = round((new - old) / old * 100, 1) if old else None
+            regressions.append({"suite": suite, "case": case, "metric": metric,
+                                "baseline": old, "current": new, "change_pct": change})
+
+    slower = lambda old, new: new > old * (1 + tolerance) and new - old >= min_delta_ms
+    fewer = lambda old, new: new < old / (1 + tolerance)
+    bigger = lambda old, new: new > old * (1 + tolerance)
+
+    for suite, result in report["suites"].items():
+        old_result = baseline.get("suites", {}).get(suite)
+        if old_result is None:
+            continue
+        if old_result["params"] != result["params"]:
+            print(f"warning: {suite} ran with other params than the baseline, the numbers may not be comparable.", file=sys.stderr)
+
+        regressed(suite, None, "peak_rss_mb", old_result.get("peak_rss_mb"), result.get("peak_rss_mb"), bigger)
+        for case, numbers in result["cases"].items():
+            old_numbers = old_result["cases"].get(case)
+            if old_numbers is None:
+                continue
+            # too few samples for p50 / p95 to mean anything (p95 of one batch = that batch).
+            if min(numbers["count"], old_numbers["count"]) < min_samples:
+                if skipped is not None:
+                    skipped.append({"suite": suite, "case": case, "count": min(numbers["count"], old_numbers["count"])})
+                continue
+            best = numbers.get("best", numbers)
+            for metric in ("p50_ms", "p95_ms"):
+                regressed(suite, case, metric, old_numbers[metric], best[metric], slower)
+            regressed(suite, case, "rps", old_numbers["rps"], best["rps"], fewer)
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suites, optionally compared with a baseline.")
+    parser.add_argument("--suite", action="append", choices=["api", "crud_core", "crud_orm"], help="run only these (repeatable)")
+    parser.add_argument("--students", type=int, default=10_000, help="roster size for the api suite (1k - 1M)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5, help="runs per suite")
+    parser.add_argument("--save", help="write the report to this file")
+    parser.add_argument("--compare", help="baseline report to compare with, exit code 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    parser.add_argument("--min-samples", type=int, default=20, help="cases with fewer timed calls are not compared")
+    args = parser.parse_args()
+
+    commands = suite_commands(args)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "suites": run_suites(commands, args.suite or list(commands), args.rounds),
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["not_compared"] = []
+        report["regressions"] = compare(report, baseline, args.tolerance, args.min_delta_ms,
+                                        args.min_samples, report["not_compared"])
+        exit_code = 1 if report["regressions"] else 0
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
@@ -0,0 +1,50 @@
+# Shared helpers for the benchmarks: latency percentiles, requests per second and peak RSS.
+import sys
+import time
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# latencies in seconds -> summary in milliseconds.
+# p50 / p95 / p99 use the nearest-rank method on the sorted samples.
+def summarize(latencies, elapsed=None, errors=0):
+    samples = sorted(latencies)
+    n = len(samples)
+
+    def percentile(p):
+        return samples[min(n - 1, max(0, round(p / 100 * n + 0.5) - 1))] * 1000
+
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    return {
+        "count": n,
+        "errors": errors,
+        "p50_ms": round(percentile(50), 4),
+        "p95_ms": round(percentile(95), 4),
+        "p99_ms": round(percentile(99), 4),
+        "mean_ms": round(sum(samples) / n * 1000, 4),
+        "rps": round(n / elapsed, 2) if elapsed else None,
+    }
+
+# calls fn() `repeat` times (after `warmup` untimed calls), returns the summary.
+# fn gets the call no., so every call can use another id.
+def time_calls(fn, repeat, warmup=5):
+    for i in range(warmup):
+        fn(i)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+# highest resident memory of this process so far, in MB (None where the resource module is missing).
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
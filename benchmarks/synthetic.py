@@ -0,0 +1,40 @@
+# Synthetic data for the benchmarks (same shape as students.json).
+import random
+
+CITIES = ["Rohtak", "Gurugram", "Mumbai", "Hyderabad", "Pune", "Bangalore", "Delhi", "Chennai"]
+BATCHES = ["Software Development 2024", "AI 2025", "AI 2024", "AIML 2023", "AIML 2025"]
+
+# {"ST000001": {...}, ...} -> seed makes the roster the same on every run.
+def make_roster(n, seed=42):
+    rng = random.Random(seed)
+    roster = {}
+    for i in range(1, n + 1):
+        problems_solved = rng.randint(0, 150)
+        roster[f"ST{i:06d}"] = {
+            "name": f"Student {i}",
+            "city": rng.choice(CITIES),
+            "batch": rng.choice(BATCHES),
+            "age": rng.randint(18, 40),
+            "problems_solved": problems_solved,
+            "passout_year": rng.randint(2010, 2030),
+            "problem_solving_percentage": round((problems_solved / 150) * 100, 2),
+        }
+    return roster
+
+# rows for bulk_create_users. The Core users table (tables.py) also has address + phone_number,
+# the ORM User model (models_orm.py) doesn't -> core=False leaves them out.
+def make_users(n, seed=42, core=True):
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        row = {"name": f"User {i}", "email": f"user{i}@example.com"}
+        if core:
+            row["address"] = f"{rng.randint(1, 999)} {rng.choice(CITIES)}"
+            row["phone_number"] = rng.randint(6_000_000_000, 9_999_999_999)
+        yield row
+
+# rows for bulk_create_posts, posts_per_user posts for every user id.
+def make_posts(user_ids, posts_per_user, seed=42):
+    rng = random.Random(seed)
+    for user_id in user_ids:
+        for j in range(posts_per_user):
+            yield {"user_id": user_id, "content": f"Post {j} by user {user_id}: " + "x" * rng.randint(10, 200)}
@@ -0,0 +1,120 @@
+# Small in-process cache: LRU with a TTL (time to live) on every entry.
+# Once maxsize entries are stored, the least recently used one gets evicted.
+# With weigh + max_weight the cache is also capped by the total weight of its values
+# (e.g. weigh=len for bytes -> max_weight is a size in bytes).
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+# Interface for a cache backend.
+# TTLCache below is the in-process one; something Redis-like (a local stand-in or a real client)
+# only has to implement these methods to be used in its place (see db_cache.use_backend).
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def stats(self):
+        ...
+
+
+class TTLCache(CacheBackend):
+    def __init__(self, maxsize=1024, ttl=300, max_weight=None, weigh=None):
+        self.maxsize = maxsize
+        self.ttl = ttl # seconds
+        self.max_weight = max_weight
+        self._weigh = weigh
+        self._weight = 0 # total weight of the stored values (0 without weigh)
+        self._data = OrderedDict() # key -> (expires_at, value, weight)
+        self._lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0 # removed because the cache was full
+        self.expirations = 0 # removed because the ttl was over
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value, _ = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key) # most recently used.
+            self.hits += 1
+            return value
+
+    # ttl -> overrides the default ttl for this entry.
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        weight = self._weigh(value) if self._weigh is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            return # would push out everything else and still not fit.
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (expires_at, value, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or (self.max_weight is not None and self._weight > self.max_weight):
+                self._remove(next(iter(self._data))) # least recently used.
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    # delete all the entries whose value matches the predicate.
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (_, value, _) in self._data.items() if predicate(value)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    # caller holds _lock
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._weight -= item[2]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "weight": self._weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._data)
@@ -1,71 +1,121 @@
-from db import engine
-from tables import users, posts
-from sqlalchemy import insert, select, update, delete, func
+from db import engine, iter_batches, BULK_BATCH_SIZE, STREAM_CHUNK_SIZE
+from tables import posts
+from statements import STATEMENTS
+from db_cache import read_through, invalidate_user, invalidate_users, user_key
+from sqlalchemy import select, lambda_stmt
+
+# All the statements are prebuilt in statements.py (with bindparam placeholders),
+# here we only pass the values for them.
+# get_user_by_id is cached (db_cache.py), every write invalidates the users it touches.
 
 # Create
 def create_users(input_name: str, input_email: str, input_address: str):
     with engine.connect() as conn:
         # insert into users(name, email) values ('Murali', 'murali@amazon.com')
-        statement = insert(users).values(name=input_name, email=input_email, address=input_address)
-        conn.execute(statement)
+        result = conn.execute(STATEMENTS["create_user"], {"name": input_name, "email": input_email, "address": input_address})
         conn.commit() # commit is also required for Write Queries.
+    invalidate_user(result.inserted_primary_key[0]) # in case "user not found" was cached for this id.
 
 def create_posts(user_id: int, content: str):
     with engine.connect() as conn:
-        # insert into users(name, email) values ('Murali', 'murali@amazon.com')
-        statement = insert(posts).values(user_id=user_id, content=content)
-        conn.execute(statement)
+        # insert into posts(user_id, content) values (1, 'Hi')
+        conn.execute(STATEMENTS["create_post"], {"user_id": user_id, "content": content})
         conn.commit() # commit is also required for Write Queries.
+    invalidate_user(user_id) # post_count of the user changed.
+
+# Bulk Create
+# rows -> iterable / generator of dictionaries, one per row, e.g.
+#   {"name": "Murali", "email": "murali@amazon.com", "address": "...", "phone_number": 1234}
+# Every batch is a single executemany INSERT + one commit, instead of one transaction (and fsync) per row.
+# Returns the ids of the inserted rows, in the same order as the input rows.
+def bulk_create_users(rows, batch_size: int = BULK_BATCH_SIZE):
+    return _bulk_insert(STATEMENTS["bulk_create_users"], rows, batch_size)
+
+# rows -> {"user_id": 1, "content": "..."}
+def bulk_create_posts(rows, batch_size: int = BULK_BATCH_SIZE):
+    return _bulk_insert(STATEMENTS["bulk_create_posts"], rows, batch_size, user_id_field="user_id")
+
+# user_id_field -> field of a row with the user id to invalidate (posts),
+# None -> the inserted id itself is the user id (users).
+def _bulk_insert(statement, rows, batch_size, user_id_field=None):
+    inserted_ids = []
+
+    with engine.connect() as conn:
+        for batch in iter_batches(rows, batch_size):
+            batch_ids = list(conn.execute(statement, batch).scalars())
+            conn.commit() # one commit per batch.
+            inserted_ids.extend(batch_ids)
+            invalidate_users(batch_ids if user_id_field is None else [row[user_id_field] for row in batch])
+
+    return inserted_ids
 
 #Read
 def get_user_by_id(input_id: int):
+    return read_through(user_key("core", input_id), lambda: _load_user_by_id(input_id))
+
+def _load_user_by_id(input_id):
     with engine.connect() as conn:
-        query = select(users).where(users.c.id == input_id)
-        result = conn.execute(query).first()
+        result = conn.execute(STATEMENTS["get_user_by_id"], {"user_id": input_id}).first()
         return result
 
 def get_all_users():
     with engine.connect() as conn:
-        query = select(users) # select * from users.
-        result = conn.execute(query).fetchall()
+        result = conn.execute(STATEMENTS["get_all_users"]).fetchall() # select * from users.
         return result
 
+# Streaming reads
+# fetchall() keeps every row in memory before returning. These are generators instead:
+# stream_results + yield_per -> rows are fetched from the DB cursor chunk_size at a time,
+# so exporting millions of rows needs memory only for one chunk.
+# The connection stays open until the generator is exhausted (or closed).
+def iter_all_users(chunk_size: int = STREAM_CHUNK_SIZE):
+    yield from _iter_rows(STATEMENTS["get_all_users"], chunk_size)
+
+def iter_posts_with_author_name(chunk_size: int = STREAM_CHUNK_SIZE):
+    yield from _iter_rows(STATEMENTS["get_posts_with_author_name"], chunk_size)
+
+def _iter_rows(statement, chunk_size):
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for row in result:
+            yield row
+
 # Write a function to get the posts for a user_id.
+# lambda_stmt -> SQLAlchemy builds the statement only once (per place in the code),
+# input_user_id is picked up from the lambda's closure and sent as a bound parameter.
+def get_posts_by_user_id(input_user_id: int):
+    with engine.connect() as conn:
+        query = lambda_stmt(lambda: select(posts).where(posts.c.user_id == input_user_id))
+        result = conn.execute(query).fetchall()
+        return result
 
 # Update
 def update_user_name(user_id: int, new_name: str):
     with  engine.connect() as conn:
         # update users set name = new_name where id = user_id
-        query = update(users).where(users.c.id == user_id).values(name=new_name)
-        conn.execute(query)
+        conn.execute(STATEMENTS["update_user_name"], {"user_id": user_id, "new_name": new_name})
         conn.commit()
+    invalidate_user(user_id)
 
 # Delete
 def delete_user_by_id(user_id: int):
     with  engine.connect() as conn:
         # delete from users where id = user_id
-        query = delete(users).where(users.c.id == user_id)
-        conn.execute(query)
+        conn.execute(STATEMENTS["delete_user_by_id"], {"user_id": user_id})
         conn.commit()
+    invalidate_user(user_id)
 
 # Join users and posts.
 # Get all the posts with their author names.
 # select p.id, p.content, u.name from users u join posts p on u.id = p.user_id
 def get_posts_with_author_name():
     with engine.connect() as conn:
-        query = select(
-            posts.c.id,
-            posts.c.content,
-            users.c.name
-        ).join(users, posts.c.user_id == users.c.id)
-
-        result = conn.execute(query).fetchall()
+        result = conn.execute(STATEMENTS["get_posts_with_author_name"]).fetchall()
         return result
 
 # get the count of posts for each user.
 def get_post_count_per_user():
     with engine.connect() as conn:
-        # select user_id, count(id) from posts group by id;
-        query = select(posts.c.user_id, func.count(posts.c.id)).group_by(posts.c.user_id)
-        result = conn.execute(query).fetchall()
+        # reads the users.post_count column (indexed), see post_count.py
+        result = conn.execute(STATEMENTS["get_post_count_per_user"]).fetchall()
         return result
@@ -0,0 +1,103 @@
+# Async version of crud_operations.py (same prebuilt statements from statements.py, awaited on the async engine).
+# Use these from `async def` routes: await get_user_by_id(1)
+from db_async import async_engine
+from db import iter_batches, BULK_BATCH_SIZE, STREAM_CHUNK_SIZE
+from tables import posts
+from statements import STATEMENTS
+from db_cache import read_through_async, invalidate_user, invalidate_users, user_key
+from sqlalchemy import select, lambda_stmt
+
+# Create
+async def create_users(input_name: str, input_email: str, input_address: str):
+    async with async_engine.connect() as conn:
+        result = await conn.execute(STATEMENTS["create_user"], {"name": input_name, "email": input_email, "address": input_address})
+        await conn.commit()
+    invalidate_user(result.inserted_primary_key[0])
+
+async def create_posts(user_id: int, content: str):
+    async with async_engine.connect() as conn:
+        await conn.execute(STATEMENTS["create_post"], {"user_id": user_id, "content": content})
+        await conn.commit()
+    invalidate_user(user_id)
+
+# Bulk Create (see crud_operations.bulk_create_users)
+async def bulk_create_users(rows, batch_size: int = BULK_BATCH_SIZE):
+    return await _bulk_insert(STATEMENTS["bulk_create_users"], rows, batch_size)
+
+async def bulk_create_posts(rows, batch_size: int = BULK_BATCH_SIZE):
+    return await _bulk_insert(STATEMENTS["bulk_create_posts"], rows, batch_size, user_id_field="user_id")
+
+async def _bulk_insert(statement, rows, batch_size, user_id_field=None):
+    inserted_ids = []
+
+    async with async_engine.connect() as conn:
+        for batch in iter_batches(rows, batch_size):
+            batch_ids = list((await conn.execute(statement, batch)).scalars())
+            await conn.commit()
+            inserted_ids.extend(batch_ids)
+            invalidate_users(batch_ids if user_id_field is None else [row[user_id_field] for row in batch])
+
+    return inserted_ids
+
+# Read
+async def get_user_by_id(input_id: int):
+    return await read_through_async(user_key("core", input_id), lambda: _load_user_by_id(input_id))
+
+async def _load_user_by_id(input_id):
+    async with async_engine.connect() as conn:
+        result = (await conn.execute(STATEMENTS["get_user_by_id"], {"user_id": input_id})).first()
+        return result
+
+async def get_all_users():
+    async with async_engine.connect() as conn:
+        result = (await conn.execute(STATEMENTS["get_all_users"])).fetchall()
+        return result
+
+# Streaming reads (see crud_operations.iter_all_users), async generators:
+# async for row in iter_all_users(): ...
+async def iter_all_users(chunk_size: int = STREAM_CHUNK_SIZE):
+    async for row in _iter_rows(STATEMENTS["get_all_users"], chunk_size):
+        yield row
+
+async def iter_posts_with_author_name(chunk_size: int = STREAM_CHUNK_SIZE):
+    async for row in _iter_rows(STATEMENTS["get_posts_with_author_name"], chunk_size):
+        yield row
+
+async def _iter_rows(statement, chunk_size):
+    async with async_engine.connect() as conn:
+        result = await conn.stream(statement, execution_options={"yield_per": chunk_size})
+        async for row in result:
+            yield row
+
+# posts for a user_id (same lambda_stmt as crud_operations.get_posts_by_user_id).
+async def get_posts_by_user_id(input_user_id: int):
+    async with async_engine.connect() as conn:
+        query = lambda_stmt(lambda: select(posts).where(posts.c.user_id == input_user_id))
+        result = (await conn.execute(query)).fetchall()
+        return result
+
+# Update
+async def update_user_name(user_id: int, new_name: str):
+    async with async_engine.connect() as conn:
+        await conn.execute(STATEMENTS["update_user_name"], {"user_id": user_id, "new_name": new_name})
+        await conn.commit()
+    invalidate_user(user_id)
+
+# Delete
+async def delete_user_by_id(user_id: int):
+    async with async_engine.connect() as conn:
+        await conn.execute(STATEMENTS["delete_user_by_id"], {"user_id": user_id})
+        await conn.commit()
+    invalidate_user(user_id)
+
+# Join users and posts.
+async def get_posts_with_author_name():
+    async with async_engine.connect() as conn:
+        result = (await conn.execute(STATEMENTS["get_posts_with_author_name"])).fetchall()
+        return result
+
+# get the count of posts for each user.
+async def get_post_count_per_user():
+    async with async_engine.connect() as conn:
+        result = (await conn.execute(STATEMENTS["get_post_count_per_user"])).fetchall()
+        return result
@@ -1,30 +1,122 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload, joinedload
 from models_orm import User, Post
 from db_orm import orm_session
+from db import iter_batches, BULK_BATCH_SIZE
+from db_cache import read_through, invalidate_user, invalidate_users, user_key, user_posts_key
 
 # Create
 def create_user(input_name: str, input_email: str):
     with orm_session() as session:
         user = User(name = input_name, email = input_email)
         session.add(user)
+        session.flush() # sends the INSERT, so user.id is known before commit.
+        user_id = user.id
         session.commit()
+    invalidate_user(user_id) # in case "user not found" was cached for this id.
 
 def create_post(input_user_id: int, input_content: str):
     with orm_session() as session:
         post = Post(user_id = input_user_id, content = input_content)
         session.add(post)
         session.commit()
+    invalidate_user(input_user_id) # posts list + post_count of the user changed.
+
+# Bulk Create
+# rows -> iterable / generator of dictionaries, e.g. {"name": "Murali", "email": "murali@amazon.com"}
+# session.scalars(insert(User).returning(...), list_of_dicts) is the ORM bulk INSERT,
+# SQLAlchemy sends each batch as multi-row INSERTs (insertmanyvalues) in one transaction.
+# Returns the ids of the inserted rows, in the same order as the input rows.
+def bulk_create_users(rows, batch_size: int = BULK_BATCH_SIZE):
+    return _bulk_insert(User, rows, batch_size)
+
+# rows -> {"user_id": 1, "content": "..."}
+def bulk_create_posts(rows, batch_size: int = BULK_BATCH_SIZE):
+    return _bulk_insert(Post, rows, batch_size, user_id_field="user_id")
+
+# user_id_field -> field of a row with the user id to invalidate (posts),
+# None -> the inserted id itself is the user id (users).
+def _bulk_insert(model, rows, batch_size, user_id_field=None):
+    inserted_ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+
+    with orm_session() as session:
+        for batch in iter_batches(rows, batch_size):
+            batch_ids = list(session.scalars(statement, batch))
+            session.commit() # one commit per batch.
+            inserted_ids.extend(batch_ids)
+            invalidate_users(batch_ids if user_id_field is None else [row[user_id_field] for row in batch])
+
+    return inserted_ids
 
 # Read
+# get_user_by_id and get_all_posts_by_user_id are cached (db_cache.py).
+# The cached objects are shared between callers, treat them as read-only.
 def get_user_by_id(input_user_id: int):
+    return read_through(user_key("orm", input_user_id), lambda: _load_user_by_id(input_user_id))
+
+def _load_user_by_id(input_user_id):
     with orm_session() as session:
         user = session.get_one(User, input_user_id) # select * from user where id = input_user_id
         return user
 
+# Eager loading
+# By default User.posts / Post.user are lazy: touching them runs one more query per object (N+1 queries),
+# and after the session is closed they can't be loaded at all.
+# selectinload -> one extra "SELECT ... WHERE id IN (...)" query for all the objects together.
+# joinedload   -> same query with a LEFT OUTER JOIN, best for many-to-one like Post.user.
+# The returned objects are detached (session is closed) but the relationship is already loaded.
+LOADING_STRATEGIES = {
+    "selectin": selectinload,
+    "joined": joinedload,
+}
+
+def _load_option(relationship, strategy):
+    if strategy not in LOADING_STRATEGIES:
+        raise ValueError(f"strategy should be one of {list(LOADING_STRATEGIES)}")
+    return LOADING_STRATEGIES[strategy](relationship)
+
+# user with user.posts loaded, None if the user doesn't exist.
+def get_user_with_posts(input_user_id: int, strategy: str = "selectin"):
+    with orm_session() as session:
+        query = select(User).where(User.id == input_user_id).options(_load_option(User.posts, strategy))
+        # unique() is required when joinedload is used on a collection (one row per post).
+        return session.scalars(query).unique().one_or_none()
+
+# all the users (or only user_ids) with their posts loaded.
+def get_users_with_posts(user_ids=None, strategy: str = "selectin"):
+    with orm_session() as session:
+        query = select(User).options(_load_option(User.posts, strategy)).order_by(User.id)
+        if user_ids is not None:
+            query = query.where(User.id.in_(user_ids))
+        return list(session.scalars(query).unique())
+
+# all the posts with post.user loaded.
+def get_posts_with_authors(strategy: str = "joined"):
+    with orm_session() as session:
+        query = select(Post).options(_load_option(Post.user, strategy)).order_by(Post.id)
+        return list(session.scalars(query))
+
+# posts of many users in one round trip -> {user_id: [posts]}
+# select * from posts left join users ... where posts.user_id in (...)
+def get_posts_for_users(user_ids, strategy: str = "joined"):
+    posts_by_user = {user_id: [] for user_id in user_ids}
+    if not posts_by_user:
+        return posts_by_user
+
+    with orm_session() as session:
+        query = (
+            select(Post)
+            .where(Post.user_id.in_(posts_by_user.keys()))
+            .options(_load_option(Post.user, strategy))
+            .order_by(Post.user_id, Post.id)
+        )
+        for post in session.scalars(query):
+            posts_by_user[post.user_id].append(post)
+
+    return posts_by_user
+
 # get all the posts by user_id
+# Earlier: get_one(User) + lazy user.posts = 2 queries, now 1 query on posts.
 def get_all_posts_by_user_id(input_user_id: int):
-    with orm_session() as session:
-        user = session.get_one(User, input_user_id) # Lazy -> this query will only fetch the user object form users table.
-        if user:
-            posts = user.posts # This will make another query to the posts table to get the posts made by the user. 
-            return posts
-        return []
\ No newline at end of file
+    return read_through(user_posts_key(input_user_id), lambda: get_posts_for_users([input_user_id])[input_user_id])
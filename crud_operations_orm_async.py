@@ -0,0 +1,95 @@
+# Async version of crud_operations_orm.py.
+# Lazy loading doesn't work with AsyncSession (it would need an implicit query),
+# so every relationship we return is loaded eagerly (selectinload / joinedload).
+from sqlalchemy import insert, select
+from models_orm import User, Post
+from db_async import async_session
+from db import iter_batches, BULK_BATCH_SIZE
+from crud_operations_orm import _load_option
+from db_cache import read_through_async, invalidate_user, invalidate_users, user_key, user_posts_key
+
+# Create
+async def create_user(input_name: str, input_email: str):
+    async with async_session() as session:
+        user = User(name = input_name, email = input_email)
+        session.add(user)
+        await session.flush()
+        user_id = user.id
+        await session.commit()
+    invalidate_user(user_id)
+
+async def create_post(input_user_id: int, input_content: str):
+    async with async_session() as session:
+        post = Post(user_id = input_user_id, content = input_content)
+        session.add(post)
+        await session.commit()
+    invalidate_user(input_user_id)
+
+# Bulk Create (see crud_operations_orm.bulk_create_users)
+async def bulk_create_users(rows, batch_size: int = BULK_BATCH_SIZE):
+    return await _bulk_insert(User, rows, batch_size)
+
+async def bulk_create_posts(rows, batch_size: int = BULK_BATCH_SIZE):
+    return await _bulk_insert(Post, rows, batch_size, user_id_field="user_id")
+
+async def _bulk_insert(model, rows, batch_size, user_id_field=None):
+    inserted_ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+
+    async with async_session() as session:
+        for batch in iter_batches(rows, batch_size):
+            batch_ids = list(await session.scalars(statement, batch))
+            await session.commit()
+            inserted_ids.extend(batch_ids)
+            invalidate_users(batch_ids if user_id_field is None else [row[user_id_field] for row in batch])
+
+    return inserted_ids
+
+# Read
+# get_user_by_id and get_all_posts_by_user_id are cached (db_cache.py), treat the results as read-only.
+async def get_user_by_id(input_user_id: int):
+    return await read_through_async(user_key("orm", input_user_id), lambda: _load_user_by_id(input_user_id))
+
+async def _load_user_by_id(input_user_id):
+    async with async_session() as session:
+        user = await session.get_one(User, input_user_id)
+        return user
+
+async def get_user_with_posts(input_user_id: int, strategy: str = "selectin"):
+    async with async_session() as session:
+        query = select(User).where(User.id == input_user_id).options(_load_option(User.posts, strategy))
+        return (await session.scalars(query)).unique().one_or_none()
+
+async def get_users_with_posts(user_ids=None, strategy: str = "selectin"):
+    async with async_session() as session:
+        query = select(User).options(_load_option(User.posts, strategy)).order_by(User.id)
+        if user_ids is not None:
+            query = query.where(User.id.in_(user_ids))
+        return list((await session.scalars(query)).unique())
+
+async def get_posts_with_authors(strategy: str = "joined"):
+    async with async_session() as session:
+        query = select(Post).options(_load_option(Post.user, strategy)).order_by(Post.id)
+        return list(await session.scalars(query))
+
+async def get_posts_for_users(user_ids, strategy: str = "joined"):
+    posts_by_user = {user_id: [] for user_id in user_ids}
+    if not posts_by_user:
+        return posts_by_user
+
+    async with async_session() as session:
+        query = (
+            select(Post)
+            .where(Post.user_id.in_(posts_by_user.keys()))
+            .options(_load_option(Post.user, strategy))
+            .order_by(Post.user_id, Post.id)
+        )
+        for post in await session.scalars(query):
+            posts_by_user[post.user_id].append(post)
+
+    return posts_by_user
+
+async def get_all_posts_by_user_id(input_user_id: int):
+    async def load():
+        return (await get_posts_for_users([input_user_id]))[input_user_id]
+    return await read_through_async(user_posts_key(input_user_id), load)
@@ -1,11 +1,119 @@
 # pip3 install sqlalchemy
 # SQL Databases - SQLite / MySQL / PostrgeSQL / OracleDB / MSSQL
-from sqlalchemy import create_engine
+import os
+import threading
+from itertools import islice
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.engine.interfaces import CacheStats
+from db_instrumentation import instrument_engine
 
-DATABASE_URL = "sqlite:///./sqlite.db"
-engine = create_engine(DATABASE_URL, echo=True)
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./sqlite.db")
+# echo=True logs every SQL statement, useful while learning / debugging but too noisy (and slow) for production.
+DB_ECHO = os.environ.get("DB_ECHO", "0") == "1"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+# size of the compiled statement cache (LRU) shared by every connection of an engine.
+DB_QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", "1200"))
 
+# SQLite performance profile, applied on every new connection.
+# WAL -> readers don't block behind a writer (and the writer doesn't block readers).
+# synchronous=NORMAL -> with WAL this is still crash safe, it just doesn't fsync on every commit.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024, # bytes
+    "cache_size": -64 * 1024, # negative value = size in KiB (64 MB)
+    "busy_timeout": 5000, # ms to wait for a lock instead of failing with "database is locked"
+}
 
-# ORM - Object Relation Mapping => ORM helps us to map our Python models/objects into DB tables.
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# Compiled statement cache counters
+# SQLAlchemy compiles a statement to SQL the first time (miss) and reuses the compiled form
+# for the same statement structure afterwards (hit), so hot reads should show up as hits.
+# The hook runs on whichever thread executes the statement -> the counters are updated under a lock.
+compiled_cache_stats = {"hits": 0, "misses": 0, "uncached": 0}
+_compiled_cache_stats_lock = threading.Lock()
+
+def count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    if context.cache_hit == CacheStats.CACHE_HIT:
+        counter = "hits"
+    elif context.cache_hit == CacheStats.CACHE_MISS:
+        counter = "misses"
+    else:
+        counter = "uncached" # plain SQL strings / statements which can't be cached.
+    with _compiled_cache_stats_lock:
+        compiled_cache_stats[counter] += 1
+
+def get_compiled_cache_stats():
+    with _compiled_cache_stats_lock:
+        stats = dict(compiled_cache_stats)
+    cached = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / cached if cached else 0.0
+    return stats
+
+# Engine factory
+# One engine (= one connection pool) per database url for the whole process.
+# db.py (Core) and db_orm.py (ORM) both use get_engine(), so they share the same pool.
+# Asking for the same url with other settings is an error, the existing engine would silently ignore them.
+_engines = {} # url -> (engine, settings it was created with)
+
+def get_engine(url=DATABASE_URL, echo=DB_ECHO, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+               query_cache_size=DB_QUERY_CACHE_SIZE, **kwargs):
+    settings = dict(echo=echo, pool_size=pool_size, max_overflow=max_overflow, query_cache_size=query_cache_size, **kwargs)
+    if url in _engines:
+        engine, engine_settings = _engines[url]
+        if settings != engine_settings:
+            raise ValueError(f"An engine for {url} already exists with other settings "
+                             f"({engine_settings} instead of {settings}).")
+        return engine
+
+    database = make_url(url).database
+    if database not in (None, "", ":memory:"):
+        # in-memory SQLite uses a single connection, pool sizes only make sense for a real database.
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow)
+
+    engine = create_engine(url, echo=echo, query_cache_size=query_cache_size, **kwargs)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    event.listen(engine, "after_cursor_execute", count_compiled_cache)
+    # query timings, slow query log, N+1 warnings (see db_instrumentation.py).
+    instrument_engine(engine)
 
+    _engines[url] = (engine, settings)
+    return engine
+
+engine = get_engine()
+
+# default no. of rows per transaction for the bulk_create_* functions.
+BULK_BATCH_SIZE = int(os.environ.get("DB_BULK_BATCH_SIZE", "1000"))
+# default no. of rows fetched at a time by the iter_* (streaming) functions.
+STREAM_CHUNK_SIZE = int(os.environ.get("DB_STREAM_CHUNK_SIZE", "1000"))
+
+# Splits any iterable (list, generator, ...) into lists of batch_size rows.
+# Only one batch is in memory at a time, so it works for generators of millions of rows.
+# batch_size is checked here and not inside the generator, so a bad value fails at the call
+# instead of islice() quietly giving no batches (a bulk insert "succeeding" with 0 rows).
+def iter_batches(rows, batch_size=BULK_BATCH_SIZE):
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}.")
+    return _iter_batches(rows, batch_size)
+
+def _iter_batches(rows, batch_size):
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# ORM - Object Relation Mapping => ORM helps us to map our Python models/objects into DB tables.
 
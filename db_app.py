@@ -0,0 +1,39 @@
+# FastAPI app on top of the SQLAlchemy CRUD functions (users / posts tables).
+# python -m uvicorn db_app:app --reload : Use this command to run the server.
+from fastapi import FastAPI, Query
+from crud_operations import iter_all_users, iter_posts_with_author_name, get_post_count_per_user
+from streaming import ndjson_response, row_dicts
+from db_cache import cache_stats
+from db_instrumentation import QueryScopeMiddleware, query_stats
+
+app = FastAPI()
+# counts the queries of every request, warns about N+1 patterns (see db_instrumentation.py).
+app.add_middleware(QueryScopeMiddleware)
+
+# Export APIs
+# The rows are streamed as NDJSON (one JSON object per line) while they are read from the DB,
+# so the memory used stays the same for 100 rows or 10 million rows.
+@app.get("/users/export")
+def export_users(chunk_size: int = Query(1000, ge=1, le=10000, description="Rows fetched from the DB at a time")):
+    rows = row_dicts(iter_all_users(chunk_size))
+    return ndjson_response(rows)
+
+@app.get("/posts/export")
+def export_posts(chunk_size: int = Query(1000, ge=1, le=10000, description="Rows fetched from the DB at a time")):
+    rows = row_dicts(iter_posts_with_author_name(chunk_size))
+    return ndjson_response(rows)
+
+# no. of posts for every user who has posted at least once.
+@app.get("/posts/counts")
+def post_counts():
+    return [row._asdict() for row in get_post_count_per_user()]
+
+# hit ratio / evictions of the user + post lookup cache (db_cache.py)
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache_stats()
+
+# statements with the most total time spent in the DB (count / avg / max per statement).
+@app.get("/db/stats")
+def get_db_stats(top: int = Query(20, ge=1, le=1000)):
+    return query_stats(top)
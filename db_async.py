@@ -0,0 +1,33 @@
+# Async engine + session for SQLAlchemy (pip3 install aiosqlite).
+# With the sync engine, a route calling the DB keeps a threadpool worker busy while it waits for the DB.
+# With the async engine, the route can `await` the query and the event loop serves other requests meanwhile.
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from db import DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_QUERY_CACHE_SIZE, apply_sqlite_pragmas, count_compiled_cache
+from db_instrumentation import instrument_engine
+
+# sqlite:///./sqlite.db -> sqlite+aiosqlite:///./sqlite.db (same database file as db.py)
+def _default_async_url():
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or _default_async_url()
+
+_async_engine_kwargs = {}
+if make_url(ASYNC_DATABASE_URL).database not in (None, "", ":memory:"):
+    _async_engine_kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=DB_ECHO, query_cache_size=DB_QUERY_CACHE_SIZE, **_async_engine_kwargs)
+
+# same SQLite performance profile as the sync engine (WAL, busy_timeout, ...).
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "after_cursor_execute", count_compiled_cache)
+instrument_engine(async_engine.sync_engine)
+
+# expire_on_commit=False -> objects can still be read after commit without another (async) query.
+async_session = async_sessionmaker(bind=async_engine, expire_on_commit=False)
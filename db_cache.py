@@ -0,0 +1,74 @@
+# Read-through cache for user / post lookups (crud_operations*, crud_operations_orm*).
+# A read first looks in the cache, only a miss goes to SQLite (and the result is stored for next time).
+# Every write which changes a user or its posts calls invalidate_user(user_id),
+# so the next read of exactly that user loads fresh data.
+import os
+import threading
+from cache import TTLCache
+
+db_cache = TTLCache(
+    maxsize=int(os.environ.get("DB_CACHE_SIZE", "10000")),
+    ttl=int(os.environ.get("DB_CACHE_TTL", "60"))
+)
+
+# swap the in-process cache for another CacheBackend implementation.
+def use_backend(backend):
+    global db_cache
+    db_cache = backend
+
+# cache keys
+def user_key(kind, user_id):
+    return f"{kind}:user:{user_id}" # kind = "core" (Row) or "orm" (User object)
+
+def user_posts_key(user_id):
+    return f"orm:user_posts:{user_id}"
+
+_MISSING = object()
+
+# Incremented on every invalidation. If an invalidation happens while we are loading from the DB,
+# the loaded value may already be old, so we return it but don't store it.
+# _generation_lock -> bump + delete and compare + set are each one step: an invalidation can't run
+# between our check and our set (that would leave the old row cached for the whole ttl).
+_generation = 0
+_generation_lock = threading.Lock()
+
+def _set_if_not_invalidated(key, value, generation):
+    with _generation_lock:
+        if generation == _generation:
+            db_cache.set(key, value)
+
+def read_through(key, load):
+    value = db_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    generation = _generation
+    value = load()
+    _set_if_not_invalidated(key, value, generation)
+    return value
+
+async def read_through_async(key, load):
+    value = db_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    generation = _generation
+    value = await load()
+    _set_if_not_invalidated(key, value, generation)
+    return value
+
+# user row changed / deleted / created, or one of its posts changed (post_count, posts list).
+def invalidate_user(user_id):
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        db_cache.delete(user_key("core", user_id))
+        db_cache.delete(user_key("orm", user_id))
+        db_cache.delete(user_posts_key(user_id))
+
+def invalidate_users(user_ids):
+    for user_id in set(user_ids):
+        invalidate_user(user_id)
+
+def cache_stats():
+    return db_cache.stats()
@@ -0,0 +1,155 @@
+# Query instrumentation for the SQLAlchemy engines (attached in db.py and db_async.py).
+#   - every statement is timed (before/after_cursor_execute), totals per statement -> query_stats()
+#   - statements slower than DB_SLOW_QUERY_MS get logged with their bound parameters
+#   - inside a query_scope() (one per request in db_app.py, or around a session / function),
+#     the queries are counted, and running the same statement DB_N_PLUS_ONE_THRESHOLD times
+#     logs an N+1 warning, e.g. a loop over users touching the lazy user.posts relationship:
+#         with query_scope("posts of all users"):
+#             for user in session.scalars(select(User)):
+#                 user.posts  # 1 SELECT ... FROM posts WHERE ? = posts.user_id per user
+#
+# Logs go to the "db.queries" logger.
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from sqlalchemy import event
+
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "100"))
+DB_N_PLUS_ONE_THRESHOLD = int(os.environ.get("DB_N_PLUS_ONE_THRESHOLD", "10"))
+# no. of different statements query_stats() keeps, the rest are only counted in the scope.
+MAX_TRACKED_STATEMENTS = 1000
+# bound parameters longer than this get cut in the slow query log (bulk inserts have thousands).
+MAX_LOGGED_PARAMS = 500
+
+logger = logging.getLogger("db.queries")
+
+# statement -> [count, total seconds, max seconds]
+_statement_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryScope:
+    def __init__(self, name, n_plus_one_threshold=DB_N_PLUS_ONE_THRESHOLD):
+        self.name = name
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.total = 0
+        self.seconds = 0.0
+        self.counts = {} # normalized statement -> no. of executions
+        self.warned = set()
+
+    def record(self, statement, elapsed):
+        self.total += 1
+        self.seconds += elapsed
+        key = _normalize(statement)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+
+        if count >= self.n_plus_one_threshold and key not in self.warned:
+            self.warned.add(key)
+            logger.warning("possible N+1 in %s: same statement executed %d times: %s", self.name, count, key)
+
+_current_scope = ContextVar("db_query_scope", default=None)
+
+# Counts the queries of everything run inside the `with` (sync or async code).
+# ContextVar -> queries run in threadpool threads started from inside the scope are counted too.
+@contextmanager
+def query_scope(name, n_plus_one_threshold=DB_N_PLUS_ONE_THRESHOLD):
+    scope = QueryScope(name, n_plus_one_threshold)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        logger.debug("%s: %d queries in %.1f ms", name, scope.total, scope.seconds * 1000)
+
+def current_scope():
+    return _current_scope.get()
+
+# "near-identical" statements -> same SQL once IN (?, ?, ?) lists and inlined numbers are folded,
+# so `WHERE id IN (1, 2)` and `WHERE id IN (3, 4, 5)` count as the same statement.
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|\d+))*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+@lru_cache(maxsize=1024)
+def _normalize(statement):
+    statement = _IN_LIST.sub("(?)", statement)
+    return " ".join(_NUMBER.sub("?", statement).split())
+
+
+# Event listeners
+# The start time is kept on the connection: a list, because a statement can run inside
+# another one's events (e.g. a lazy load triggered while processing rows).
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start_time")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    with _stats_lock:
+        stats = _statement_stats.get(statement)
+        if stats is None and len(_statement_stats) < MAX_TRACKED_STATEMENTS:
+            stats = _statement_stats[statement] = [0, 0.0, 0.0]
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        params = repr(parameters)
+        if len(params) > MAX_LOGGED_PARAMS:
+            params = params[:MAX_LOGGED_PARAMS] + "..."
+        logger.warning("slow query (%.1f ms%s): %s params=%s",
+                       elapsed * 1000, ", executemany" if executemany else "", statement, params)
+
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.record(statement, elapsed)
+
+# a failed statement never gets its after_cursor_execute -> drop its start time here.
+def discard_start_time(exception_context):
+    conn = exception_context.connection
+    started = conn.info.get("query_start_time") if conn is not None else None
+    if started:
+        started.pop()
+
+# sync engine, or async_engine.sync_engine
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", discard_start_time)
+
+# slowest statements first (by total time).
+def query_stats(top=20):
+    with _stats_lock:
+        rows = [(statement, *stats) for statement, stats in _statement_stats.items()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return [
+        {"statement": statement, "count": count, "total_ms": total * 1000,
+         "avg_ms": total * 1000 / count, "max_ms": longest * 1000}
+        for statement, count, total, longest in rows[:top]
+    ]
+
+def reset_query_stats():
+    with _stats_lock:
+        _statement_stats.clear()
+
+
+# ASGI middleware: one query_scope per request, named "GET /users/export".
+class QueryScopeMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with query_scope(f'{scope["method"]} {scope["path"]}'):
+            await self.app(scope, receive, send)
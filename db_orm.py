@@ -1,11 +1,10 @@
 # This file creates a Session for SQLAlchemy ORM.
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from db import get_engine
 
-DATABASE_URL = "sqlite:///./sqlite.db"
-
-orm_engine = create_engine(DATABASE_URL, echo=True)
+# same engine (and connection pool) as db.py, see get_engine().
+orm_engine = get_engine()
 orm_session = sessionmaker(bind=orm_engine)
 
 # ORM -> Object Relation Mapping.
-# User Model -> User table
\ No newline at end of file
+# User Model -> User table
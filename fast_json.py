@@ -0,0 +1,21 @@
+# JSON helpers which use orjson when it is installed (pip3 install orjson), else the standard json module.
+# orjson is written in Rust and is several times faster than json for both dumps and loads,
+# and it works with bytes directly (no str -> bytes encoding step).
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# object -> compact UTF-8 bytes
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# bytes / str -> object
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
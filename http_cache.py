@@ -0,0 +1,81 @@
+# HTTP response caching for the student read endpoints.
+# The students data only changes on create / update / delete, and every change bumps store.version.
+# ETag = that version, so:
+#   - a client sending If-None-Match with the current ETag gets an empty 304 (nothing changed),
+#   - otherwise the serialized response bytes are cached per (path, query params, version),
+#     so polling the same URL doesn't serialize the same payload again and again.
+# An old version is never asked for again, so all its entries are dropped as soon as the version changes.
+# A full roster body can be many MB, so the cache is capped by bytes too (RESPONSE_CACHE_MAX_MB).
+import os
+import secrets
+import threading
+from fastapi import Request, Response
+from cache import TTLCache
+import fast_json
+from metrics import span
+
+response_cache = TTLCache(
+    maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", "256")),
+    ttl=int(os.environ.get("RESPONSE_CACHE_TTL", "3600")),
+    max_weight=int(os.environ.get("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    weigh=lambda cached: len(cached[0]), # (body, headers)
+)
+
+# version whose responses are in response_cache.
+_cached_version = None
+_version_lock = threading.Lock()
+
+# True if responses of this version may be cached (it's the newest one we have seen).
+def _use_version(version):
+    global _cached_version
+    with _version_lock:
+        if version != _cached_version:
+            if _cached_version is not None and version < _cached_version:
+                return False # a request which read the version just before a write, don't cache it.
+            _cached_version = version
+            response_cache.clear()
+        return True
+
+# random per process, so version 5 before a restart and version 5 after it get different ETags.
+_etag_prefix = secrets.token_hex(4)
+
+def make_etag(version):
+    return f'"{_etag_prefix}-{version}"'
+
+# If-None-Match: "a", W/"b"  or  *
+def if_none_match(request: Request):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",")]
+
+def etag_matches(tags, etag):
+    return etag in tags or f"W/{etag}" in tags
+
+# build() -> (content, extra headers), it only runs when the bytes are not cached yet.
+def cached_json_response(request: Request, version, build):
+    etag = make_etag(version)
+    tags = if_none_match(request)
+    if etag_matches(tags, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cacheable = _use_version(version)
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), version)
+    cached = response_cache.get(key) if cacheable else None
+    if cached is None:
+        # build() raises the 404 of a missing student, so it runs before `*` is looked at.
+        with span("storage"):
+            content, headers = build()
+        with span("serialize"):
+            body = fast_json.dumps(content)
+        cached = (body, headers)
+        if cacheable:
+            response_cache.set(key, cached)
+
+    # * -> "any current representation": only matches once we know the resource exists.
+    if "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body, headers = cached
+    # no-cache -> clients may keep the response, but must check the ETag with us before using it.
+    return Response(body, media_type="application/json", headers={**headers, "ETag": etag, "Cache-Control": "no-cache"})
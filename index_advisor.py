@@ -0,0 +1,82 @@
+# Missing index advisor
+# Runs EXPLAIN QUERY PLAN for the statements in statements.py (used by crud_operations.py)
+# and flags every full table scan, so a missing / dropped index is caught before deploy.
+#
+# python index_advisor.py                                -> checks a fresh in-memory DB built from tables.py
+# python index_advisor.py --database-url sqlite:///./sqlite.db  -> checks a real (migrated) database
+# Exit code 1 if any statement does a full scan which is not in EXPECTED_FULL_SCANS.
+import argparse
+import sys
+from sqlalchemy import create_engine, select, bindparam
+from tables import metadata, posts
+from statements import STATEMENTS
+
+# statements which read the complete table on purpose (exports / listings) -> alternatives of
+# table names allowed to be scanned, the plan is fine if its scans fit in one of them.
+# The author-name join reads all posts and their authors: depending on the table stats SQLite scans one side
+# and searches the other one by an index, a plan scanning both tables is what we want to catch.
+EXPECTED_FULL_SCANS = {
+    "get_all_users": [{"users"}],
+    "get_posts_with_author_name": [{"posts"}, {"users"}],
+}
+
+# queries which are not in the registry but should use an index too.
+EXTRA_STATEMENTS = {
+    # crud_operations.get_posts_by_user_id (lambda_stmt) / lazy load of User.posts
+    "get_posts_by_user_id": select(posts).where(posts.c.user_id == bindparam("user_id")),
+    # crud_operations_orm.get_posts_for_users
+    "get_posts_for_users": select(posts).where(posts.c.user_id.in_([1, 2, 3])),
+}
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params # None for placeholders without a value, fine for EXPLAIN.
+    if compiled.positiontup:
+        params = tuple(params.get(name) for name in compiled.positiontup)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params).fetchall()
+    return [row[-1] for row in rows] # last column = detail, e.g. "SCAN posts"
+
+# "SCAN posts" / "SCAN posts USING COVERING INDEX ..." -> every row of the table (or index) is read.
+def scanned_tables(plan):
+    return {detail.split()[1] for detail in plan if detail.startswith("SCAN ")}
+
+# scanned tables which are not allowed for this statement (empty set = ok).
+def unexpected_scans(name, plan):
+    scanned = scanned_tables(plan)
+    return min((scanned - allowed for allowed in EXPECTED_FULL_SCANS.get(name, [set()])), key=len)
+
+def check(engine):
+    statements = {**STATEMENTS, **EXTRA_STATEMENTS}
+    problems = 0
+
+    with engine.connect() as conn:
+        for name, statement in statements.items():
+            if statement.is_insert:
+                continue # inserts don't search anything.
+
+            plan = explain(conn, statement)
+            unexpected = unexpected_scans(name, plan)
+            status = "FULL SCAN" if unexpected else "ok"
+            problems += bool(unexpected)
+
+            print(f"[{status}] {name}")
+            for detail in plan:
+                print(f"    {detail}")
+
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flag full table scans in the CRUD statements.")
+    parser.add_argument("--database-url", help="database to check (default: fresh in-memory DB from tables.py)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://")
+        metadata.create_all(engine)
+
+    problems = check(engine)
+    print(f"{problems} statement(s) with an unexpected full scan.")
+    sys.exit(1 if problems else 0)
@@ -7,14 +7,52 @@
 
 # pip3 install fastapi pydantic uvicorn
 
-from fastapi import FastAPI, HTTPException, Path, Query, Depends
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, computed_field
+from fastapi import FastAPI, HTTPException, Path, Query, Depends, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, computed_field, TypeAdapter, ValidationError
 from typing import Annotated, Optional
-from auth import authenticate_user
-import json
-
-app = FastAPI()
+from auth import authenticate_user_async, bcrypt_pool
+from student_repository import create_repository, encode_cursor, decode_cursor
+from streaming import ndjson_response, NDJSON_MEDIA_TYPE
+from http_cache import cached_json_response
+import metrics
+import fast_json
+from contextlib import asynccontextmanager
+import os
+
+# Students storage, picked with STUDENTS_BACKEND=json|sqlite (see student_repository.py).
+# The handlers below only use the StudentRepository methods, so they work with both.
+store = create_repository()
+
+# On shutdown, close the store (json: fold the pending journal entries back into students.json).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    store.close()
+    bcrypt_pool.shutdown()
+
+# STUDENTS_ORJSON_RESPONSE=1 -> responses of the other endpoints get serialized with orjson (pip3 install orjson)
+# instead of json.dumps. The student read endpoints already send pre-serialized bytes (http_cache.py).
+if os.environ.get("STUDENTS_ORJSON_RESPONSE", "0") == "1":
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+else:
+    app = FastAPI(lifespan=lifespan)
+
+# latency / status / in-flight metrics for every request, served on /metrics (see metrics.py).
+app.add_middleware(metrics.MetricsMiddleware)
+
+def _bcrypt_pool_metrics():
+    stats = bcrypt_pool.stats()
+    return [
+        ("bcrypt_pool_queued", "gauge", "bcrypt calls waiting for a worker.", stats["queued"]),
+        ("bcrypt_pool_running", "gauge", "bcrypt calls running right now.", stats["running"]),
+        ("bcrypt_pool_completed_total", "counter", "bcrypt calls finished.", stats["completed"]),
+        ("bcrypt_pool_rejected_total", "counter", "bcrypt calls rejected because the queue was full.", stats["rejected"]),
+        ("bcrypt_pool_wait_seconds_total", "counter", "Total time bcrypt calls spent in the queue.", stats["wait_seconds"]),
+    ]
+
+metrics.register_collector(_bcrypt_pool_metrics)
 
 #ge = greater than equal
 #gt = greater than
@@ -55,18 +93,14 @@ def say_hello():
 def about():
     return {"message" : "This is a sample FastAPI server"}
 
-# this method is used to read the data from students.json file
-def load_data():
-    with open('students.json', 'r') as f:
-        data = json.load(f)
-
-    return data
-
-def save_data(data):
-    with open('students.json', 'w') as f:
-        json.dump(data, f)
+# Prometheus scrape endpoint.
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # Create all the APIs to perform CRUD operations on Students JSON file.
+# All the reads and writes go through the store (see student_repository.py),
+# earlier every request used to load / rewrite the complete students.json file.
 
 # Read API - get
 
@@ -74,22 +108,68 @@ def save_data(data):
 # make this endpoint authenticated (this endpoint needs username, password to get called.)
 # should we call authenticate_user manually ? NO
 # We'll use dependency injection. 
+# The read APIs return an ETag, and cache the serialized response until the next create / update / delete.
+# (see http_cache.py) -> a client polling with If-None-Match gets a 304 when nothing has changed.
 @app.get("/students")
-def get_students(current_username = Depends(authenticate_user)):
-    data = load_data()
-    return data
+def get_students(request: Request,
+                 limit: Optional[int] = Query(None, ge=1, description="Max no. of students in one page"),
+                 cursor: Optional[str] = Query(None, description="X-Next-Cursor header value of the previous page"),
+                 stream: bool = Query(False, description="Stream the students as NDJSON"),
+                 current_username = Depends(authenticate_user_async)):
+    after = _get_cursor_entry('id', cursor)
+
+    if stream:
+        rows = ({"id": entry[1], **student} for entry, student in store.iterate('id', after=after, limit=limit))
+        return ndjson_response(rows)
+
+    def build():
+        # no paging params -> all the students in one dictionary (same as before).
+        if limit is None and cursor is None:
+            return store.all(), {}
+
+        page = store.page('id', limit=limit, after=after)
+        return {entry[1]: student for entry, student in page}, _next_cursor_headers('id', page, limit)
+
+    return cached_json_response(request, store.version, build)
+
+# Export API - the complete roster as NDJSON (one student per line), streamed from the store.
+# This route must be above /students/{student_id}, else "export" would be taken as a student id.
+@app.get("/students/export")
+def export_students(current_username = Depends(authenticate_user_async)):
+    rows = ({"id": entry[1], **student} for entry, student in store.iterate('id'))
+    return ndjson_response(rows, headers={"Content-Disposition": 'attachment; filename="students.ndjson"'})
+
+# Cursor pagination
+# The response of a page has the X-Next-Cursor header (if there are more students),
+# pass its value in the cursor query param to get the next page.
+# Unlike offset, the cursor still points to the right place if students are added / deleted in between.
+def _get_cursor_entry(field, cursor):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(field, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _next_cursor_headers(field, page, limit):
+    if limit is not None and len(page) == limit:
+        return {"X-Next-Cursor": encode_cursor(field, page[-1][0])}
+    return {}
 
 # get the data for a student with the given id.
 # localhost:8000/students/ST001
 # student_id = Path Parameter.
 # three dots inside the path function represents that student_id is a mandatory parameter.
 @app.get("/students/{student_id}")
-def get_student_with_id(student_id: str = Path(..., description="Pass the studentId in string format.", example="ST001")):
-    file_data = load_data()
+def get_student_with_id(request: Request, student_id: str = Path(..., description="Pass the studentId in string format.", example="ST001")):
+    def build():
+        student = store.get(student_id)
+
+        if student is not None: # valid student id.
+            return student, {}
+        raise HTTPException(status_code=404, detail="Student not found.")
 
-    if student_id in file_data: # valid student id.
-        return file_data[student_id]
-    raise HTTPException(status_code=404, detail="Student not found.")
+    return cached_json_response(request, store.version, build)
 
 # Implement an API to get the student details in sorted format.
 # Client should be able sort students based on problems, city .....
@@ -99,8 +179,15 @@ def get_student_with_id(student_id: str = Path(..., description="Pass the studen
 # localhost:8000/sort?sort_by=<>&order=asc
 # sort_by => mandatory param.
 # order => optional param with default value of asc.
+# limit, offset => optional params to get only one page of the sorted students.
 @app.get("/sort")
-def sort_students(sort_by : str = Query(..., description="Sort on the basis of problems_solved or passout_year"), order : str = Query('asc', description="Sort in asc or desc order")):
+def sort_students(request: Request,
+                  sort_by : str = Query(..., description="Sort on the basis of problems_solved or passout_year"), 
+                  order : str = Query('asc', description="Sort in asc or desc order"),
+                  limit : Optional[int] = Query(None, ge=1, description="Max no. of students to return"),
+                  offset : int = Query(0, ge=0, description="No. of students to skip"),
+                  cursor : Optional[str] = Query(None, description="X-Next-Cursor header value of the previous page"),
+                  stream : bool = Query(False, description="Stream the students as NDJSON")):
     valid_sort_by = ['problems_solved', 'passout_year']
 
     # 400 status code - Bad request
@@ -110,19 +197,21 @@ def sort_students(sort_by : str = Query(..., description="Sort on the basis of p
     if order not in ['asc', 'desc']:
         raise HTTPException(status_code=400, detail="Order can only be either asc or desc")
     
-    students_data = load_data() # Dictionary
+    after = _get_cursor_entry(sort_by, cursor)
 
-    #sort students_data
-    # if user is providing order param then use it else make it asc.
-    # reverse = True => DESC
-    # reverse = False => ASC
-    sort_order = False
-    if order == 'desc':
-        sort_order = True
+    if stream:
+        rows = store.iterate(sort_by, order, after=after, limit=limit, offset=offset)
+        return ndjson_response({"id": entry[1], **student} for entry, student in rows)
 
-    sorted_students_data = sorted(students_data.values(), key=lambda x : x.get(sort_by, 0), reverse=sort_order)
+    # Both backends keep an index for problems_solved and passout_year
+    # (json: sorted lists in memory, sqlite: database indexes + ORDER BY / LIMIT),
+    # so here we only fetch the page we need instead of calling sorted() on every request.
+    def build():
+        page = store.page(sort_by, order, offset, limit, after)
+        sorted_students_data = [student for _, student in page]
+        return sorted_students_data, _next_cursor_headers(sort_by, page, limit)
 
-    return sorted_students_data
+    return cached_json_response(request, store.version, build)
 
 # Create API - POST
 # User should provide the student details in the request body
@@ -130,22 +219,90 @@ def sort_students(sort_by : str = Query(..., description="Sort on the basis of p
 def create_student(input_student_data : Student):
     # validate all the student attributes coming in the request body.
 
-    students_data = load_data() # Dictionary
-
-    if input_student_data.id in students_data:
-        raise HTTPException(status_code=400, detail="Student with id already exists.")
-    
-    # Create a new student and save it in the file.
+    # Create a new student and save it in the store.
     # model_dump -> Converts Pydantic model or object into dictionary.
     input_student_dict = input_student_data.model_dump(exclude="id")
 
-    students_data[input_student_data.id] = input_student_dict
+    # lock -> the check and the insert happen together, two requests can't create the same id.
+    with metrics.span("storage"), store.lock:
+        if input_student_data.id in store:
+            raise HTTPException(status_code=400, detail="Student with id already exists.")
 
-    save_data(students_data)
+        store.put(input_student_data.id, input_student_dict)
 
     return JSONResponse(status_code=200, content='Student created successfully.')
 
 
+# Bulk Create API - POST
+# Request body: JSON array of students, or NDJSON (one student per line, Content-Type: application/x-ndjson).
+# All the rows are validated together with TypeAdapter(list[Student]).
+# If any row is invalid, nothing is saved and every bad row is reported with its index.
+# Else all the students are saved in one step (one journal write), not one file write per student.
+students_list_adapter = TypeAdapter(list[Student])
+
+@app.post("/students/bulk")
+async def create_students_bulk(request: Request):
+    body = await request.body()
+    # parsing + validating 10k rows is CPU work, keep it off the event loop.
+    return await run_in_threadpool(_create_students_bulk, body, request.headers.get("content-type", ""))
+
+def _create_students_bulk(body, content_type):
+    rows, row_errors = _parse_bulk_body(body, content_type)
+
+    if not row_errors:
+        try:
+            students = students_list_adapter.validate_python(rows)
+        except ValidationError as e:
+            row_errors = _group_errors_by_row(e)
+
+    if row_errors:
+        return JSONResponse(status_code=422, content={"detail": "No students were created.", "errors": row_errors})
+
+    with metrics.span("storage"), store.lock:
+        row_errors = _duplicate_id_errors(students)
+        if row_errors:
+            return JSONResponse(status_code=422, content={"detail": "No students were created.", "errors": row_errors})
+
+        store.put_many({student.id: student.model_dump(exclude="id") for student in students})
+
+    return JSONResponse(status_code=200, content={"created": len(students)})
+
+def _parse_bulk_body(body, content_type):
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        rows, row_errors = [], []
+        for i, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                rows.append(fast_json.loads(line))
+            except ValueError:
+                rows.append(None)
+                row_errors.append({"row": i, "errors": [{"loc": [], "msg": "Invalid JSON."}]})
+        return rows, row_errors
+
+    try:
+        rows = fast_json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body should be a JSON array or NDJSON.")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Request body should be a JSON array of students.")
+    return rows, []
+
+# ValidationError loc = (row index, field, ...) -> [{"row": 3, "errors": [{"loc": ["age"], "msg": "..."}]}]
+def _group_errors_by_row(validation_error):
+    errors_by_row = {}
+    for error in validation_error.errors():
+        row, *loc = error["loc"]
+        errors_by_row.setdefault(row, []).append({"loc": loc, "msg": error["msg"]})
+    return [{"row": row, "errors": errors} for row, errors in sorted(errors_by_row.items())]
+
+def _duplicate_id_errors(students):
+    row_errors, seen = [], set()
+    for i, student in enumerate(students):
+        if student.id in store or student.id in seen:
+            row_errors.append({"row": i, "errors": [{"loc": ["id"], "msg": "Student with id already exists."}]})
+        seen.add(student.id)
+    return row_errors
+
+
 # Update Student API
 # Put -> Replace  or Patch -> Partial
 # This update api will take care of both partial and complete replace student api
@@ -155,12 +312,16 @@ def create_student(input_student_data : Student):
 #   2. update_student_details -> request body
 @app.put("/update/{student_id}")
 def update_student(student_id: str, update_student_object: UpdateStudent):
-    students_data = load_data()
+    # lock -> concurrent updates of the same student can't overwrite each other.
+    with metrics.span("storage"), store.lock:
+        return _update_student(student_id, update_student_object)
 
-    if student_id not in students_data:
+def _update_student(student_id: str, update_student_object: UpdateStudent):
+    if student_id not in store:
         raise HTTPException(status_code=404, detail="Student not found.")
     
-    existing_student = students_data[student_id]
+    # copy -> don't modify the stored dictionary before the new data is validated.
+    existing_student = dict(store.get(student_id))
 
     # convert the input object into dictionary
     updated_student_info = update_student_object.model_dump(exclude_unset=True)
@@ -187,11 +348,7 @@ def update_student(student_id: str, update_student_object: UpdateStudent):
     # convert existing_student_object back to dictionary
     new_students_data = existing_student_object.model_dump(exclude=["id"])
 
-    print(new_students_data)
-
-    students_data[student_id] = new_students_data
-
-    save_data(students_data) # writing the data to the file.
+    store.put(student_id, new_students_data)
 
     return JSONResponse(status_code=200, content='Student updated successfully.')
 
@@ -207,14 +364,11 @@ def update_student(student_id: str, update_student_object: UpdateStudent):
 
 @app.delete("/delete/{student_id}")
 def delete_student(student_id : str):
-    student_data = load_data()
-
-    if student_id not in student_data:
-        raise HTTPException(status_code=404, detail="Student not found.")
-    
-    del student_data[student_id]
-
-    save_data(student_data)
+    with metrics.span("storage"), store.lock:
+        if student_id not in store:
+            raise HTTPException(status_code=404, detail="Student not found.")
+        
+        store.delete(student_id)
 
     return JSONResponse(status_code=200, content='Student deleted successfully.')
 
@@ -0,0 +1,182 @@
+# Request metrics in Prometheus text format (GET /metrics in main.py).
+#   http_request_duration_seconds{method, route}  -> latency histogram per route
+#   http_requests_total{method, route, status}     -> no. of requests per route and status code
+#   http_requests_in_flight                        -> requests being handled right now
+#   app_span_duration_seconds{route, span}         -> time spent in a part of a request (auth, storage, serialize)
+# route = the route template ("/students/{student_id}"), not the real path, so the no. of series stays small.
+#
+# Kept cheap on purpose (no prometheus_client): a plain ASGI middleware, a bisect + two
+# additions per observation, and the text is only built when /metrics gets scraped.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {} # label values (tuple) -> value
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+# Gauge without labels, only changed by the middleware on the event loop thread -> no lock needed.
+class Gauge:
+    kind = "gauge"
+    labelnames = ()
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def samples(self):
+        return [(self.name, (), self.value)]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [count per bucket (not cumulative, last one = +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            # bisect_left -> first bucket with le >= value
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        samples = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for le, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", labels + (str(le),), cumulative))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+request_duration = Histogram("http_request_duration_seconds", "Request latency, until the last body byte was sent.",
+                             ("method", "route"))
+requests_total = Counter("http_requests_total", "Requests by route and status code.", ("method", "route", "status"))
+requests_in_flight = Gauge("http_requests_in_flight", "Requests being handled right now.")
+span_duration = Histogram("app_span_duration_seconds", "Time spent in one part of a request.", ("route", "span"))
+
+METRICS = [request_duration, requests_total, requests_in_flight, span_duration]
+
+# functions returning extra samples at scrape time: [(name, kind, help, value)], e.g. bcrypt pool stats.
+_collectors = []
+
+def register_collector(collect):
+    _collectors.append(collect)
+
+
+# scope of the request being handled, the spans read the route from it.
+# ContextVar -> it is also visible in the threadpool threads of sync endpoints / dependencies.
+_current_scope = ContextVar("metrics_scope", default=None)
+
+def _route_of(scope):
+    # FastAPI puts the matched route into the scope while routing.
+    route = scope.get("route") if scope is not None else None
+    return getattr(route, "path", "<unmatched>")
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_duration.observe((_route_of(_current_scope.get()), name), time.perf_counter() - start)
+
+
+# Pure ASGI middleware (BaseHTTPMiddleware would add a task + a memory stream per request).
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500 # if the app fails before sending anything, the server answers 500.
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        requests_in_flight.value += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.value -= 1
+            _current_scope.reset(token)
+            route = _route_of(scope)
+            request_duration.observe((scope["method"], route), time.perf_counter() - start)
+            requests_total.inc((scope["method"], route, str(status_code)))
+
+
+# Prometheus text exposition format (version 0.0.4).
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        labelnames = metric.labelnames + (("le",) if metric.kind == "histogram" else ())
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+
+    for collect in _collectors:
+        for name, kind, help, value in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def _format_labels(labelnames, labels):
+    if not labels:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels))
+    return "{" + ",".join(pairs) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, joinedload
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from db_orm import orm_engine
+from post_count import attach_post_count_triggers
 
 class Base(DeclarativeBase):
     pass # Placeholder - Do Nothing! 
@@ -12,6 +13,8 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(50), nullable=False)
     email: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    # no. of posts of the user, kept in sync by triggers on posts (see post_count.py).
+    post_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0", index=True)
 
     # list[post] => Don't a create a columnn for list of posts in the DB table.
     # back_populates is used to link two ORM models bidirectionally in a relationship.
@@ -28,6 +31,8 @@ class User(Base):
 # User ---- Post => 1:M
 class Post(Base):
     __tablename__ = "posts"
+    # same index as tables.py, the lazy / selectin load of User.posts searches posts by user_id.
+    __table_args__ = (Index("ix_posts_user_id", "user_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     content: Mapped[str] = mapped_column(String, nullable=False)
@@ -38,5 +43,7 @@ class Post(Base):
     def __repr__(self) -> str:
         return f"Posts(post_id: {self.id}, content: {self.content})"
 
+attach_post_count_triggers(Post.__table__)
+
 def create_tables():
     Base.metadata.create_all(orm_engine)
\ No newline at end of file
@@ -0,0 +1,198 @@
+# Async embedding client on top of an EmbeddingProvider (embedding_providers.py):
+#  - micro-batching: embed() calls made at about the same time are sent as one embeddings.create call,
+#    a batch goes out when it has max_batch_size texts or max_wait_ms after its first text.
+#  - dedupe: the same text asked for twice (queued or already in flight) -> embedded once, both callers get the vector.
+#  - on-disk cache: sqlite file keyed by sha256(model + text) -> float32 bytes, so re-runs skip everything already embedded.
+#
+# client = BatchingEmbeddingClient(get_provider(), EmbeddingCache("embeddings/cache.sqlite3"))
+# vector = await client.embed("masai")                  -> shape (dimensions,)
+# matrix = await client.embed_many(["a", "b", "a"])     -> shape (3, dimensions)
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_MAX_BATCH_SIZE", "256"))
+EMBEDDING_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_MAX_WAIT_MS", "20"))
+# no. of provider calls running at the same time (rate limits).
+EMBEDDING_MAX_CONCURRENT_BATCHES = int(os.environ.get("EMBEDDING_MAX_CONCURRENT_BATCHES", "4"))
+
+
+# model is part of the key -> vectors of different models / dimensions never mix.
+def cache_key(model, dimensions, text):
+    return hashlib.sha256(f"{model}\0{dimensions}\0{text}".encode()).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # used from asyncio.to_thread -> one connection shared by the worker threads, guarded by a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL) WITHOUT ROWID")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # keys -> {key: float32 vector} for the keys which are in the cache.
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # sqlite allows a limited no. of ? per statement.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    # items -> (key, vector) pairs
+    def put_many(self, items):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                                   [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BatchingEmbeddingClient:
+    def __init__(self, provider, cache=None, max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+                 max_wait_ms=EMBEDDING_MAX_WAIT_MS, max_concurrent_batches=EMBEDDING_MAX_CONCURRENT_BATCHES):
+        self.provider = provider
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._semaphore = asyncio.Semaphore(max_concurrent_batches)
+        self._futures = {}  # key -> future, for every text which is queued or in flight
+        self._queue = []    # (key, text) waiting for the next batch
+        self._timer = None
+        self._tasks = set()
+        # counters, e.g. to see how much the cache / dedupe saved.
+        self.stats = {"texts": 0, "deduped": 0, "cache_hits": 0, "batches": 0, "embedded": 0}
+
+    def _key(self, text):
+        return cache_key(self.provider.model, self.provider.dimensions, text)
+
+    async def embed(self, text):
+        self.stats["texts"] += 1
+        # shield -> a cancelled caller doesn't cancel the vector for the other callers of the same text.
+        return await asyncio.shield(self._submit(self._key(text), text))
+
+    # Many texts at once: one cache lookup for all of them, only the misses go through the batcher.
+    async def embed_many(self, texts):
+        self.stats["texts"] += len(texts)
+        keys = [self._key(text) for text in texts]
+        cached = {}
+        if self.cache is not None and keys:
+            cached = await asyncio.to_thread(self.cache.get_many, set(keys))
+            self.stats["cache_hits"] += sum(key in cached for key in keys)
+
+        vectors = np.empty((len(texts), self.provider.dimensions), dtype=np.float32)
+        rows_of = {}  # key -> rows with that text, the same text in `texts` twice is embedded once
+        futures = []
+        for row, (key, text) in enumerate(zip(keys, texts)):
+            if key in cached:
+                vectors[row] = cached[key]
+            elif key in rows_of:
+                rows_of[key].append(row)
+                self.stats["deduped"] += 1
+            else:
+                rows_of[key] = [row]
+                futures.append(self._submit(key, text))
+
+        if futures:
+            results = await asyncio.shield(asyncio.gather(*futures))
+            for rows, vector in zip(rows_of.values(), results):
+                vectors[rows] = vector
+        return vectors
+
+    def _submit(self, key, text):
+        future = self._futures.get(key)
+        if future is not None:
+            self.stats["deduped"] += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = self._futures[key] = loop.create_future()
+        self._queue.append((key, text))
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    # Sends everything queued, max_batch_size texts per provider call.
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch_size], self._queue[self.max_batch_size:]
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        keys = [key for key, _ in batch]
+        try:
+            async with self._semaphore:
+                # texts embed()-ed one by one haven't been looked up in the cache yet.
+                cached = {}
+                if self.cache is not None:
+                    cached = await asyncio.to_thread(self.cache.get_many, keys)
+                    self.stats["cache_hits"] += len(cached)
+                misses = [(key, text) for key, text in batch if key not in cached]
+
+                vectors = {}
+                if misses:
+                    texts = [text for _, text in misses]
+                    if hasattr(self.provider, "embed_async"):
+                        matrix = await self.provider.embed_async(texts)
+                    else: # local providers are CPU work -> off the event loop.
+                        matrix = await asyncio.to_thread(self.provider.embed, texts)
+                    self.stats["batches"] += 1
+                    self.stats["embedded"] += len(misses)
+                    vectors = {key: matrix[row] for row, (key, _) in enumerate(misses)}
+                    if self.cache is not None:
+                        await asyncio.to_thread(self.cache.put_many, vectors.items())
+
+            for key in keys:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_result(cached[key] if key in cached else vectors[key])
+        except Exception as e:
+            # every caller waiting on this batch gets the error, nobody hangs.
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        finally:
+            # task cancelled (loop shutting down) -> cancel the callers too.
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None:
+                    future.cancel()
+
+    # Sends what is still queued and waits for all batches in flight.
+    async def aclose(self):
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,92 @@
+# Embedding providers -> turn a list of texts into a float32 matrix, one row per text.
+# OpenAIEmbeddingProvider calls the API (text-embedding-3-large, 3072 dims by default).
+# HashingEmbeddingProvider is a local stand-in: no API key, no network, same text -> same vector,
+# and texts sharing words get similar vectors, so search results can be checked in tests.
+#
+# EMBEDDING_PROVIDER=openai (default) | hashing  -> get_provider()
+import hashlib
+import os
+import re
+import numpy as np
+
+
+# Interface: every provider has a model name, a no. of dimensions and embed().
+class EmbeddingProvider:
+    model = None
+    dimensions = None
+
+    # texts (list of str) -> np.ndarray of shape (len(texts), dimensions), dtype float32
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model="text-embedding-3-large", dimensions=3072, client=None, batch_size=256):
+        self.model = model
+        self.dimensions = dimensions
+        # one API call takes a list of inputs -> batch_size texts per call instead of one call per text.
+        self.batch_size = batch_size
+        self._client = client
+        self._async_client = None
+
+    @property
+    def client(self):
+        # created on first use, so the hashing provider works without the openai package / API key.
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client
+
+    def embed(self, texts):
+        vectors = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = self.client.embeddings.create(model=self.model, input=batch, dimensions=self.dimensions)
+            # item.index -> position of the text in the input list.
+            for item in response.data:
+                vectors[start + item.index] = item.embedding
+        return vectors
+
+    # same as embed(), one API call, without blocking the event loop (used by embedding_client.py).
+    async def embed_async(self, texts):
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI()
+        vectors = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        response = await self._async_client.embeddings.create(model=self.model, input=texts, dimensions=self.dimensions)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+
+# Feature hashing: every word (and word pair) is hashed to one of `dimensions` buckets with a +1 / -1 sign.
+# blake2b instead of hash() -> Python's hash() of a str changes on every run.
+class HashingEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, dimensions=256, model="hashing-v1"):
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dimensions] += 1.0 if value >> 63 else -1.0
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def get_provider(name=None):
+    name = name or os.environ.get("EMBEDDING_PROVIDER", "openai")
+    if name == "openai":
+        return OpenAIEmbeddingProvider(
+            model=os.environ.get("EMBEDDING_MODEL", "text-embedding-3-large"),
+            dimensions=int(os.environ.get("EMBEDDING_DIMENSIONS", "3072")),
+        )
+    if name == "hashing":
+        return HashingEmbeddingProvider(dimensions=int(os.environ.get("EMBEDDING_DIMENSIONS", "256")))
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER {name!r}, use 'openai' or 'hashing'.")
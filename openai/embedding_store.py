@@ -0,0 +1,307 @@
+# Local vector store + top-k similarity search.
+# All the vectors live in one contiguous float32 matrix in <path>.f32, memory-mapped with numpy:
+# the OS pages it in on demand, so opening a store of millions of vectors is instant and
+# searching doesn't need a copy in Python objects. <path>.json keeps the ids (row i -> ids[i])
+# and a hash of the text every vector was made from, so a changed text gets embedded again.
+#
+# Vectors are L2-normalized when they are added -> cosine similarity = dot product,
+# and a search is one matrix multiplication per chunk of rows (queries are searched together, batched).
+#
+# For large corpora build_index() adds an IVF index (<path>.ivf.npz): k-means splits the vectors
+# into n_lists clusters, and a search only scans the n_probe clusters closest to the query.
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+INITIAL_CAPACITY = 1024 # rows, the matrix file doubles when it is full
+SEARCH_CHUNK_ROWS = 65536 # rows multiplied at a time by the exact search (bounds the memory used)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+# Keeps the k best (highest score) columns of every row. scores: (q, n), rows: (n,) -> (q, k) rows + scores, best first.
+def top_k(scores, rows, k):
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=np.float32)
+    # argpartition -> the k best in O(n), only those k get sorted.
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    return rows[best], np.take_along_axis(best_scores, order, axis=1)
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+# write to a temp file + os.replace -> a crash never leaves half a file (same as student_store.save_data).
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class EmbeddingStore:
+    def __init__(self, path, dimensions=None, model=None, read_only=False):
+        self.path = path
+        self.matrix_path = path + ".f32"
+        self.meta_path = path + ".json"
+        self.index_path = path + ".ivf.npz"
+        self.read_only = read_only
+        self.index = None
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if dimensions is not None and dimensions != meta["dimensions"]:
+                raise ValueError(f"{path} has {meta['dimensions']} dimensions, not {dimensions}.")
+            self.dimensions = meta["dimensions"]
+            self.model = meta.get("model")
+            self.capacity = meta["capacity"]
+            self.ids = meta["ids"]
+            self.text_hashes = meta.get("text_hashes", {})
+        else:
+            if dimensions is None:
+                raise ValueError(f"{path} doesn't exist yet, pass dimensions to create it.")
+            if read_only:
+                raise FileNotFoundError(self.meta_path)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.dimensions = dimensions
+            self.model = model
+            self.capacity = INITIAL_CAPACITY
+            self.ids = []
+            self.text_hashes = {}
+            with open(self.matrix_path, 'wb') as f:
+                f.truncate(self.capacity * self.dimensions * 4)
+            self.flush()
+
+        self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+        self._map()
+        if os.path.exists(self.index_path):
+            self.index = IVFIndex.load(self.index_path)
+
+    def _map(self):
+        mode = 'r' if self.read_only else 'r+'
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dimensions))
+
+    # only the filled rows (a view, no copy).
+    @property
+    def vectors(self):
+        return self._matrix[:len(self.ids)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    def get(self, item_id):
+        return np.array(self._matrix[self._rows[item_id]])
+
+    # Adds (or replaces) vectors. ids -> list of str, vectors -> (len(ids), dimensions)
+    # texts -> the texts the vectors were made from (see changed_texts).
+    def add(self, ids, vectors, texts=None):
+        vectors = normalize(vectors)
+        if vectors.shape != (len(ids), self.dimensions):
+            raise ValueError(f"Expected vectors of shape ({len(ids)}, {self.dimensions}), got {vectors.shape}.")
+
+        rows = []
+        for item_id in ids:
+            row = self._rows.get(item_id)
+            if row is None:
+                row = self._rows[item_id] = len(self.ids)
+                self.ids.append(item_id)
+            rows.append(row)
+
+        self._ensure_capacity(len(self.ids))
+        # a replaced row keeps its IVF cluster until build_index() runs again (still found, maybe less often).
+        self._matrix[rows] = vectors
+        for row, item_id in enumerate(ids):
+            if texts is None:
+                self.text_hashes.pop(item_id, None) # text unknown -> embedded again by the next add_texts.
+            else:
+                self.text_hashes[item_id] = _text_hash(texts[row])
+
+    # (id, text) pairs which are new, or whose text is not the one their vector was made from.
+    def changed_texts(self, ids, texts):
+        return [(item_id, text) for item_id, text in zip(ids, texts)
+                if self.text_hashes.get(item_id) != _text_hash(text)]
+
+    # texts -> provider.embed -> add, only for the new / changed texts.
+    def add_texts(self, ids, texts, provider):
+        changed = self.changed_texts(ids, texts)
+        if changed:
+            changed_ids, changed_texts = map(list, zip(*changed))
+            self.add(changed_ids, provider.embed(changed_texts), changed_texts)
+        return len(changed)
+
+    def _ensure_capacity(self, rows):
+        if rows <= self.capacity:
+            return
+        self._matrix.flush()
+        del self._matrix
+        self.capacity = max(rows, self.capacity * 2)
+        with open(self.matrix_path, 'r+b') as f:
+            f.truncate(self.capacity * self.dimensions * 4)
+        self._map()
+
+    # vectors to disk, then the ids (a crash in between leaves extra rows nobody points to, never missing ones).
+    def flush(self):
+        if hasattr(self, "_matrix"):
+            self._matrix.flush()
+        meta = {"dimensions": self.dimensions, "model": self.model, "capacity": self.capacity,
+                "ids": self.ids, "text_hashes": self.text_hashes}
+        _atomic_write(self.meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    # Top-k search. queries -> one vector or a (q, dimensions) matrix.
+    # Returns one list of (id, cosine similarity) per query, best first.
+    # With an index: approximate, only the n_probe closest clusters are scanned (more = slower + more accurate).
+    def search(self, queries, k=10, n_probe=8, exact=False):
+        queries = normalize(queries)
+        if self.index is not None and not exact:
+            rows, scores = self.index.search(self.vectors, queries, k, n_probe, tail_search=self._exact_search)
+        else:
+            rows, scores = self._exact_search(queries, k, 0, len(self.ids))
+        return [
+            [(self.ids[row], float(score)) for row, score in zip(query_rows, query_scores)]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    # brute force over rows [start, stop), chunk by chunk, keeping the running top-k.
+    def _exact_search(self, queries, k, start, stop):
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for chunk_start in range(start, stop, SEARCH_CHUNK_ROWS):
+            chunk_stop = min(chunk_start + SEARCH_CHUNK_ROWS, stop)
+            scores = queries @ self._matrix[chunk_start:chunk_stop].T
+            rows = np.arange(chunk_start, chunk_stop)
+            chunk_rows, chunk_scores = top_k(scores, rows, k)
+            # merge with the best of the previous chunks.
+            merged_rows = np.concatenate([best_rows, chunk_rows], axis=1)
+            merged_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            best = np.argsort(-merged_scores, axis=1, kind="stable")[:, :k]
+            best_rows = np.take_along_axis(merged_rows, best, axis=1)
+            best_scores = np.take_along_axis(merged_scores, best, axis=1)
+        return best_rows, best_scores
+
+    # Builds (and saves) the IVF index over the vectors added so far.
+    # Vectors added later are still found: rows after the indexed ones are searched exactly,
+    # until the next build_index(). (A replaced vector stays in its old cluster until then.)
+    def build_index(self, n_lists=None, n_iter=10, seed=42):
+        self.flush()
+        self.index = IVFIndex.build(self.vectors, n_lists, n_iter, seed)
+        self.index.save(self.index_path)
+        return self.index
+
+    def drop_index(self):
+        self.index = None
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def close(self):
+        if not self.read_only:
+            self.flush()
+        del self._matrix
+
+
+# Inverted file index: k-means centroids + for every centroid the list of rows assigned to it.
+# The rows are stored grouped by list (list_rows[list_offsets[i]:list_offsets[i + 1]] = rows of list i).
+class IVFIndex:
+    def __init__(self, centroids, list_offsets, list_rows, indexed_rows):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.indexed_rows = indexed_rows # no. of store rows covered by the index
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, n_iter=10, seed=42):
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Can't build an index over an empty store.")
+        # rule of thumb: ~sqrt(n) lists
+        n_lists = min(n, n_lists or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        # train on a sample, 64 vectors per list is enough for the centroids.
+        sample_size = min(n, n_lists * 64)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = _spherical_kmeans(sample, n_lists, n_iter, rng)
+
+        assignments = _assign(vectors, centroids)
+        list_rows = np.argsort(assignments, kind="stable")
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+        return cls(centroids, list_offsets, list_rows, n)
+
+    # tail_search(queries, k, start, stop) -> exact search over the rows added after the build.
+    def search(self, vectors, queries, k, n_probe, tail_search=None):
+        n_probe = min(n_probe, len(self.centroids))
+        # closest clusters of every query, all queries in one multiplication.
+        probe_lists = top_k(queries @ self.centroids.T, np.arange(len(self.centroids)), n_probe)[0]
+
+        all_rows = np.empty((len(queries), k), dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probe_lists)):
+            candidates = np.sort(np.concatenate([self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists]))
+            rows, scores = top_k((vectors[candidates] @ query)[None, :], candidates, k)
+            all_rows[i, :rows.shape[1]] = rows[0]
+            all_scores[i, :scores.shape[1]] = scores[0]
+
+        # rows added after the index was built.
+        if tail_search is not None and len(vectors) > self.indexed_rows:
+            tail_rows, tail_scores = tail_search(queries, k, self.indexed_rows, len(vectors))
+            merged_rows = np.concatenate([all_rows, tail_rows], axis=1)
+            merged_scores = np.concatenate([all_scores, tail_scores], axis=1)
+            best = np.argsort(-merged_scores, axis=1, kind="stable")[:, :k]
+            all_rows = np.take_along_axis(merged_rows, best, axis=1)
+            all_scores = np.take_along_axis(merged_scores, best, axis=1)
+
+        # fewer than k candidates -> drop the empty slots.
+        found = np.isfinite(all_scores)
+        return [rows[mask] for rows, mask in zip(all_rows, found)], [scores[mask] for scores, mask in zip(all_scores, found)]
+
+    def save(self, path):
+        _atomic_write(path, lambda f: np.savez(f, centroids=self.centroids, list_offsets=self.list_offsets,
+                                               list_rows=self.list_rows, indexed_rows=self.indexed_rows))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["centroids"], data["list_offsets"], data["list_rows"], int(data["indexed_rows"]))
+
+
+# k-means on the unit sphere: similarity = dot product, centroids normalized after every step.
+def _spherical_kmeans(data, n_lists, n_iter, rng):
+    centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _assign(data, centroids)
+        # sum of the vectors of every cluster: sort by cluster, then add up each run of rows.
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[clusters] = np.add.reduceat(data[order], starts, axis=0)
+        # an empty cluster gets a random vector again.
+        empty = ~sums.any(axis=1)
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+# closest centroid of every vector, chunk by chunk.
+def _assign(vectors, centroids):
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SEARCH_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + SEARCH_CHUNK_ROWS])
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
@@ -1,14 +1,66 @@
-from openai import OpenAI
+# Embeddings + local semantic search.
+# The vectors are kept in an EmbeddingStore (embedding_store.py) under openai/embeddings/,
+# so every run only embeds the records which are new or whose text changed.
+# Texts go through BatchingEmbeddingClient (embedding_client.py): batched API calls, and an on-disk cache
+# (openai/embeddings/cache.sqlite3) so a text embedded once - e.g. the query - is never sent again.
+#
+# python vector_embeddings.py "students from pune in the AI batch"
+# EMBEDDING_PROVIDER=hashing python vector_embeddings.py "..."  -> local stand-in, no API key / calls.
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+from embedding_client import BatchingEmbeddingClient, EmbeddingCache
+from embedding_providers import get_provider
+from embedding_store import EmbeddingStore
 
-client = OpenAI()
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
 
-response = client.embeddings.create(
-    model="text-embedding-3-large",
-    input="masai"
-)
+provider = get_provider()
+client = BatchingEmbeddingClient(provider, EmbeddingCache(os.path.join(HERE, "embeddings", "cache.sqlite3")))
 
-# embeddings = []
-# for item in response.data:
-#     embeddings.append(item.embedding)
+# student records from students.json -> "student:ST001": "Neha Singhal from Rohtak, ..."
+def student_documents(path=os.path.join(ROOT, "students.json")):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        students = json.load(f)
+    return {
+        f"student:{student_id}": f"{s.get('name')} from {s.get('city')}, batch {s.get('batch')}, "
+                                 f"solved {s.get('problems_solved')} problems, passout year {s.get('passout_year')}"
+        for student_id, s in students.items()
+    }
 
-print(len(response.data[0].embedding))
\ No newline at end of file
+# posts.content from the SQLAlchemy database -> "post:1": "..."
+def post_documents(path=os.path.join(ROOT, "sqlite.db")):
+    if not os.path.exists(path):
+        return {}
+    with sqlite3.connect(path) as conn:
+        try:
+            return {f"post:{post_id}": content for post_id, content in conn.execute("SELECT id, content FROM posts")}
+        except sqlite3.OperationalError: # no posts table yet
+            return {}
+
+async def main(query):
+    # one vector, like before: text-embedding-3-large -> 3072 numbers.
+    print(len(await client.embed("masai")))
+
+    documents = {**student_documents(), **post_documents()}
+
+    # one store per model, vectors of different models can't be compared.
+    store = EmbeddingStore(os.path.join(HERE, "embeddings", provider.model), dimensions=provider.dimensions, model=provider.model)
+    changed = store.changed_texts(list(documents), list(documents.values()))
+    if changed:
+        ids, texts = map(list, zip(*changed))
+        store.add(ids, await client.embed_many(texts), texts)
+    store.flush()
+    await client.aclose()
+    print(f"{len(changed)} new / changed document(s), {len(store)} in the store. {client.stats}")
+
+    for item_id, score in store.search(await client.embed_many([query]), k=5)[0]:
+        print(f"{score:.3f}  {item_id}  {documents.get(item_id, '')}")
+
+
+asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "masai"))
@@ -0,0 +1,69 @@
+# Denormalized post count
+# users.post_count keeps the no. of posts of every user, so the "post count per user" read
+# doesn't have to scan + GROUP BY the whole posts table every time.
+# SQLite triggers keep it in sync for every insert / delete / update on posts,
+# whether it comes from Core (create_posts, bulk_create_posts), the ORM (create_post) or plain SQL.
+#
+# python post_count.py verify  -> prints the users whose stored count is wrong (exit code 1 if any).
+# python post_count.py rebuild -> recomputes post_count for all the users.
+import sys
+from sqlalchemy import DDL, event, text
+
+POST_COUNT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_count_insert AFTER INSERT ON posts
+    BEGIN
+        UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_count_delete AFTER DELETE ON posts
+    BEGIN
+        UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_count_update AFTER UPDATE OF user_id ON posts
+    WHEN OLD.user_id != NEW.user_id
+    BEGIN
+        UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+        UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+    END
+    """,
+]
+
+# create the triggers together with the posts table (metadata.create_all).
+def attach_post_count_triggers(posts_table):
+    for trigger in POST_COUNT_TRIGGERS:
+        event.listen(posts_table, "after_create", DDL(trigger).execute_if(dialect="sqlite"))
+
+ACTUAL_COUNT = "(SELECT count(*) FROM posts WHERE posts.user_id = users.id)"
+
+# users whose stored post_count doesn't match the real no. of posts -> [(user_id, stored, actual)]
+def verify_post_counts(conn):
+    query = text(f"SELECT id, post_count, {ACTUAL_COUNT} AS actual FROM users WHERE post_count != {ACTUAL_COUNT}")
+    return conn.execute(query).fetchall()
+
+# recompute post_count for every user, returns the no. of users which were fixed.
+def rebuild_post_counts(conn):
+    result = conn.execute(text(f"UPDATE users SET post_count = {ACTUAL_COUNT} WHERE post_count != {ACTUAL_COUNT}"))
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "verify":
+        with engine.connect() as conn:
+            drift = verify_post_counts(conn)
+        for user_id, stored, actual in drift:
+            print(f"user {user_id}: post_count = {stored}, actual = {actual}")
+        print(f"{len(drift)} user(s) with a wrong post_count.")
+        sys.exit(1 if drift else 0)
+    elif command == "rebuild":
+        with engine.begin() as conn:
+            print(f"Fixed post_count for {rebuild_post_counts(conn)} user(s).")
+    else:
+        print("usage: python post_count.py [verify|rebuild]")
+        sys.exit(2)
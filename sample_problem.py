@@ -2,18 +2,22 @@ from enum import Enum
 from pydantic import BaseModel
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import hashlib
+import time
 # pip3 install python-jose
-from jose import jwt
+from jose import jwt, JWTError
+from cache import TTLCache
 
 # OAuth2PasswordRequestForm -> Used to get the username, password in the input param.
 # OAuth2PasswordBearer -> Get the token from the input HTTP request.
 
 app = FastAPI()
-ouath2_scheme = OAuth2PasswordBearer(tokenUrl = "token")
+ouath2_scheme = OAuth2PasswordBearer(tokenUrl = "login")
 
 ALGORITHM = "HS256"
 SECRET_KEY = "our_secret_key"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 class Role(str, Enum):
     ADMIN = "admin"
@@ -37,16 +41,19 @@ users_db = {
 # b : payload
 # c : signature
 # data = { "username" : "anjum", "role" : "admin"}
-def create_access_token(data: dict):
+def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     # Creates a JWT Token for the username and role coming in the input param
     
     # token will be valid for 60 mins after creation.
-    token_expiry_time = datetime.utcnow() + timedelta(minutes=60)
-    data.update("expiry", token_expiry_time)
-    # data = { "username" : "anjum", "role" : "admin", "expiry" : "21st Feb 2026, 9:24 PM"}
+    # "exp" is the standard JWT claim for expiry, it must be a number (seconds since epoch).
+    # jwt.decode checks it automatically and fails for an expired token.
+    to_encode = data.copy()
+    token_expiry_time = datetime.now(timezone.utc) + expires_delta
+    to_encode["exp"] = int(token_expiry_time.timestamp())
+    # data = { "username" : "anjum", "role" : "admin", "exp" : 1771689240}
 
     # The below line will create the token in the form a.b.c 
-    token = jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
+    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     return token
 
@@ -68,21 +75,61 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         data = {"username" : user['username'], "role" : user['role']}
     )
 
-    return access_token
+    return {"access_token" : access_token, "token_type" : "bearer"}
 
-def get_user_details_from_token(token: str = Depends(ouath2_scheme)):
-    # decode the token and get the payload out of it.
-    try:
-        # If the token decoding fails, then it throw an exception.
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("username")
-        role = payload.get("role")
-        expiry_time = payload.get("expiry")
+# Verified tokens cache
+# Verifying the signature (HMAC) on every request is wasted work when the same token comes again and again.
+# So once a token is verified, we keep its claims until the token expires.
+# key = sha256 of the token, so the cache doesn't hold the tokens themselves.
+verified_tokens = TTLCache(maxsize=10000, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_access_token(token: str):
+    token_digest = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(token_digest)
+    if claims is not None:
+        return claims
 
-        if expiry_time < datetime.utcnow():
-            raise HTTPException(status_code401, detail = "Token expired.")
+    # If the token decoding fails (wrong signature or expired), then it throw an exception.
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
-        return {"username" : username, "role" : role}
-    except:
-        raise HTTPException(status_code = 401, detail = "Invalid Token.")
+    expiry_time = payload.get("exp")
+    if expiry_time is None:
+        raise JWTError("Token has no expiry.")
 
+    claims = {"username" : payload.get("username"), "role" : Role(payload.get("role"))}
+    # cache entry expires together with the token.
+    verified_tokens.set(token_digest, claims, ttl=expiry_time - time.time())
+    return claims
+
+def get_user_details_from_token(token: str = Depends(ouath2_scheme)):
+    # decode the token and get the payload out of it.
+    try:
+        return decode_access_token(token)
+    except (JWTError, ValueError):
+        # JWTError -> bad signature / expired token, ValueError -> unknown role.
+        raise HTTPException(status_code = 401, detail = "Invalid or expired token.")
+
+# Role based access
+# require_role(Role.ADMIN) returns a dependency which only lets admins through.
+# After the first request, this is a cache lookup + a set lookup, no signature verification.
+def require_role(*allowed_roles: Role):
+    allowed = set(allowed_roles)
+
+    def check_role(user: dict = Depends(get_user_details_from_token)):
+        if user["role"] not in allowed:
+            raise HTTPException(status_code = 403, detail = "You are not allowed to access this resource.")
+        return user
+
+    return check_role
+
+@app.get("/me")
+def get_me(user: dict = Depends(get_user_details_from_token)):
+    return user
+
+@app.get("/admin")
+def admin_only(user: dict = Depends(require_role(Role.ADMIN))):
+    return {"message" : f"Welcome admin {user['username']}."}
+
+@app.get("/reports")
+def reports(user: dict = Depends(require_role(Role.ADMIN, Role.MANAGER))):
+    return {"message" : f"Reports for {user['username']}."}
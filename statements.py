@@ -0,0 +1,40 @@
+# Prepared statement registry for crud_operations.py (and crud_operations_async.py).
+# Every statement is built once when the module is imported, with bindparam() placeholders for the values.
+# So a call only passes a parameters dict, instead of building select/update/join objects again,
+# and SQLAlchemy finds the compiled SQL in the engine's compiled cache straight away.
+# (See db.get_compiled_cache_stats() for the hit / miss counters.)
+from sqlalchemy import insert, select, update, delete, bindparam
+from tables import users, posts
+
+STATEMENTS = {
+    # insert(table) + a parameters dict -> INSERT with the columns present in the dict.
+    "create_user": insert(users),
+    "create_post": insert(posts),
+    # executemany with RETURNING -> ids come back in the order of the input rows.
+    "bulk_create_users": insert(users).returning(users.c.id, sort_by_parameter_order=True),
+    "bulk_create_posts": insert(posts).returning(posts.c.id, sort_by_parameter_order=True),
+
+    # select * from users where id = :user_id
+    "get_user_by_id": select(users).where(users.c.id == bindparam("user_id")),
+
+    # select * from users
+    "get_all_users": select(users),
+
+    # update users set name = :new_name where id = :user_id
+    "update_user_name": update(users).where(users.c.id == bindparam("user_id")).values(name=bindparam("new_name")),
+
+    # delete from users where id = :user_id
+    "delete_user_by_id": delete(users).where(users.c.id == bindparam("user_id")),
+
+    # select p.id, p.content, u.name from users u join posts p on u.id = p.user_id
+    "get_posts_with_author_name": select(
+        posts.c.id,
+        posts.c.content,
+        users.c.name
+    ).join(users, posts.c.user_id == users.c.id),
+
+    # select id as user_id, post_count from users where post_count > 0
+    # post_count is maintained by triggers (post_count.py), so no GROUP BY scan of posts here.
+    # No ORDER BY on purpose, it would turn the index search into a scan of users (see index_advisor.py).
+    "get_post_count_per_user": select(users.c.id.label("user_id"), users.c.post_count).where(users.c.post_count > 0),
+}
@@ -0,0 +1,32 @@
+# Helpers to stream rows to the client as NDJSON (one JSON object per line).
+# The response starts going out as soon as the first rows are ready,
+# instead of building (and serializing) the complete payload in memory first.
+from fastapi.responses import StreamingResponse
+import fast_json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# rows are grouped into chunks of lines, a separate chunk per row would be too many small writes.
+def iter_ndjson(rows, rows_per_chunk=100):
+    lines = []
+    for row in rows:
+        lines.append(fast_json.dumps(row))
+        if len(lines) >= rows_per_chunk:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+# SQLAlchemy rows -> plain dicts.
+# The row keys are quoted_name objects (a str subclass) and orjson only takes exact str keys
+# ("Dict key must be str"), so the keys are turned into str once, not per row.
+def row_dicts(rows):
+    keys = None
+    for row in rows:
+        if keys is None:
+            keys = [str(key) for key in row._fields]
+        yield dict(zip(keys, row))
+
+def ndjson_response(rows, headers=None):
+    return StreamingResponse(iter_ndjson(rows), media_type=NDJSON_MEDIA_TYPE, headers=headers)
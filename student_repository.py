@@ -0,0 +1,118 @@
+# Storage for the students API (main.py).
+# The route handlers only talk to a StudentRepository, which one is used comes from config:
+#   STUDENTS_BACKEND=json   -> students.json + journal, everything in memory (student_store.py), default
+#   STUDENTS_BACKEND=sqlite -> SQLAlchemy students table with indexes, sorting / paging in SQL (student_store_sql.py)
+import base64
+import json
+import os
+from abc import ABC, abstractmethod
+
+STUDENTS_BACKEND = os.environ.get("STUDENTS_BACKEND", "json")
+# fields on which /sort can sort -> every backend keeps an index on them.
+SORTABLE_FIELDS = ['problems_solved', 'passout_year']
+
+
+# Interface for a students backend (abstract: a backend missing one of the methods fails when it is created).
+# A student is a dict without the id (the id is the key), same as in students.json.
+# Paging works on "entries" = (sort value, student_id), for field 'id' that's (student_id, student_id);
+# the entry of the last student of a page is what goes into the cursor for the next page.
+class StudentRepository(ABC):
+    # `with repository.lock:` -> the check + write of a handler (read-modify-write) happens
+    # as one step, no other request (or worker) can write in between. Reentrant.
+    lock = None
+
+    # changes on every write, used for the ETag of the read endpoints (see http_cache.py).
+    version = 0
+
+    @abstractmethod
+    def get(self, student_id, default=None):
+        ...
+
+    @abstractmethod
+    def __contains__(self, student_id):
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    # {student_id: student} for all the students.
+    @abstractmethod
+    def all(self):
+        ...
+
+    # one page as a list of (entry, student); after -> entry from the previous page.
+    @abstractmethod
+    def page(self, field, order='asc', offset=0, limit=None, after=None):
+        ...
+
+    @abstractmethod
+    def put(self, student_id, student):
+        ...
+
+    # many students in one step, either all of them get saved or none.
+    @abstractmethod
+    def put_many(self, students):
+        ...
+
+    @abstractmethod
+    def delete(self, student_id):
+        ...
+
+    def close(self):
+        pass
+
+    def sorted_by(self, field, order='asc', offset=0, limit=None):
+        return [student for _, student in self.page(field, order, offset, limit)]
+
+    # Generator version of page() used for streaming responses.
+    # It fetches chunk by chunk (each chunk starts after the last entry of the previous one),
+    # so we never hold the complete roster in a list.
+    # offset -> no. of students skipped first (before limit), same as page().
+    def iterate(self, field, order='asc', after=None, limit=None, chunk_size=500, offset=0):
+        while limit is None or limit > 0:
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            page = self.page(field, order, offset, limit=size, after=after)
+            offset = 0 # only the first chunk skips, the next ones start after its last entry.
+            if not page:
+                return
+
+            yield from page
+
+            after = page[-1][0]
+            if limit is not None:
+                limit -= len(page)
+
+
+# Cursor = last (value, student_id) entry of a page, base64 encoded so clients treat it as an opaque string.
+# The field name is kept inside it, so a /sort cursor can't be used with another sort_by.
+def encode_cursor(field, entry):
+    raw = json.dumps([field, entry[0], entry[1]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(field, cursor):
+    try:
+        cursor_field, value, student_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+    if cursor_field != field:
+        raise ValueError("Cursor does not belong to this sort order.")
+    # the value gets compared with the index entries -> it must have the field's type
+    # (a str problems_solved would fail the comparison with the ints instead of giving a 400).
+    value_type = str if field == 'id' else int
+    if not isinstance(student_id, str) or type(value) is not value_type:
+        raise ValueError("Invalid cursor.")
+    return (value, student_id)
+
+
+# The backend modules get imported here and not at the top, so the json backend
+# doesn't need SQLAlchemy and the sqlite backend doesn't open students.json.
+def create_repository(backend=STUDENTS_BACKEND):
+    if backend == "json":
+        from student_store import StudentStore
+        return StudentStore()
+    if backend == "sqlite":
+        from student_store_sql import SqlStudentStore
+        return SqlStudentStore()
+    raise ValueError(f"Unknown STUDENTS_BACKEND {backend!r}, use 'json' or 'sqlite'.")
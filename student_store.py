@@ -0,0 +1,452 @@
+# In-memory store for the students API.
+# students.json is loaded once when the process starts and every read is served from memory.
+# Writes are appended to a journal file (one JSON line per change) and folded back into
+# students.json every few hundred changes (compaction), so we never rewrite the whole file per request.
+import bisect
+import os
+import stat
+import tempfile
+import threading
+import fast_json
+from student_repository import StudentRepository, SORTABLE_FIELDS
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+STUDENTS_FILE = os.environ.get("STUDENTS_FILE", "students.json")
+# number of journaled student changes after which the journal gets compacted into students.json
+# (a put_many of 10k students counts as 10k, it is replayed row by row on the next start).
+COMPACT_EVERY = int(os.environ.get("STUDENTS_COMPACT_EVERY", "500"))
+# 1 -> serialize writes across processes (uvicorn --workers N) with an fcntl lock on students.json.lock,
+# and readers pick up the changes of the other workers. On by default where fcntl exists.
+# 0 -> one process only: the store keeps students.json.lock locked for its whole life,
+# so a second process on the same students.json fails at start instead of losing writes on compaction.
+FILE_LOCK = os.environ.get("STUDENTS_FILE_LOCK", "1" if fcntl is not None else "0") == "1"
+
+# this method is used to read the data from students.json file
+# bytes in / bytes out (see fast_json.py, orjson if installed).
+def load_data(path=STUDENTS_FILE):
+    with open(path, 'rb') as f:
+        data = fast_json.loads(f.read())
+
+    return data
+
+# Atomic write: the data goes into a temp file in the same folder, gets fsynced and then
+# os.replace() swaps it in. A crash mid-write leaves the old students.json untouched,
+# never a half written one (os.replace is atomic as long as both paths are on the same filesystem).
+def save_data(data, path=STUDENTS_FILE):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".students-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(fast_json.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            # mkstemp creates the file with 0600, keep the permissions of the old file.
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+# fsync of the folder makes the rename itself survive a power cut.
+# Not every OS/filesystem allows opening a folder (e.g. Windows), there we just skip it.
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Lock for the read-modify-write cycles of the store.
+# Inside one process it is a normal RLock. With STUDENTS_FILE_LOCK=1 the outermost `with`
+# also takes an exclusive fcntl lock on students.json.lock, so several uvicorn workers
+# sharing the same students.json take turns, and right after getting the lock the store
+# catches up with the changes the other workers journaled in the meantime (on_acquire).
+# Readers only take it when the files changed under them, see StudentStore._refresh.
+# shared=False -> single process: the file lock is taken once here (non blocking) and kept till close().
+class StoreLock:
+    def __init__(self, lock_path=None, on_acquire=None, shared=True):
+        self._rlock = threading.RLock()
+        self._depth = 0 # only touched while holding _rlock
+        self._on_acquire = on_acquire
+        self._lock_file = None
+        self._shared = shared
+        if lock_path is not None:
+            if fcntl is None:
+                raise RuntimeError("STUDENTS_FILE_LOCK needs fcntl, which is not available on this platform.")
+            self._lock_file = open(lock_path, 'a')
+            if not shared:
+                try:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self.close()
+                    raise RuntimeError(f"{lock_path} is held by another process. Several processes can only "
+                                       "share the students file with STUDENTS_FILE_LOCK=1.")
+
+    def __enter__(self):
+        self._rlock.acquire()
+        self._depth += 1
+        if self._depth == 1 and self._lock_file is not None and self._shared:
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                if self._on_acquire is not None:
+                    self._on_acquire()
+            except BaseException:
+                self._release()
+                raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+    def _release(self):
+        if self._depth == 1 and self._lock_file is not None and self._shared:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        self._depth -= 1
+        self._rlock.release()
+
+    def close(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+# Keeps (value, student_id) pairs of one field in sorted order.
+# bisect finds the position in O(log n), so we never have to sort the whole roster again,
+# and a page of k students in asc or desc order is just a slice of the list.
+class SortedIndex:
+    def __init__(self, field):
+        self.field = field
+        self._entries = []
+
+    def _entry(self, student_id, student):
+        if self.field == 'id':
+            return (student_id, student_id)
+        # missing value sorts as 0, same as the old sorted(..., key=lambda x: x.get(sort_by, 0))
+        return (student.get(self.field, 0), student_id)
+
+    def add(self, student_id, student):
+        bisect.insort(self._entries, self._entry(student_id, student))
+
+    def remove(self, student_id, student):
+        entry = self._entry(student_id, student)
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def rebuild(self, students):
+        self._entries = sorted(self._entry(student_id, student) for student_id, student in students.items())
+
+    # Returns one page of entries.
+    # after -> an entry (cursor) from the previous page, the page starts right after it.
+    def page(self, order='asc', offset=0, limit=None, after=None):
+        entries = self._entries
+
+        if order == 'desc':
+            # walk the list from the end.
+            stop = len(entries) if after is None else bisect.bisect_left(entries, after)
+            stop = max(stop - offset, 0)
+            start = 0 if limit is None else max(stop - limit, 0)
+            return entries[start:stop][::-1]
+
+        start = 0 if after is None else bisect.bisect_right(entries, after)
+        start += offset
+        stop = len(entries) if limit is None else start + limit
+        return entries[start:stop]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# STUDENTS_BACKEND=json (default) -> see student_repository.py
+class StudentStore(StudentRepository):
+    def __init__(self, path=STUDENTS_FILE, compact_every=COMPACT_EVERY, file_lock=FILE_LOCK):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+
+        # reentrant -> the same thread can take it again, so handlers can wrap a
+        # read-modify-write (check + put) in `with store.lock:`. See StoreLock for file_lock.
+        # Without fcntl (Windows) there is no file lock at all -> one process only.
+        self.file_lock = file_lock
+        lock_path = path + ".lock" if file_lock or fcntl is not None else None
+        self.lock = StoreLock(lock_path, on_acquire=self._catch_up, shared=file_lock)
+        self._students = {}
+        self._journal = None
+        self._pending = 0 # journaled student changes not yet compacted into students.json
+        # how far into the journal we have applied, and which students.json we loaded (see _catch_up).
+        self._journal_offset = 0
+        self._file_id = None
+        # 'id' index -> used for paging through /students.
+        self.indexes = {field: SortedIndex(field) for field in ['id'] + SORTABLE_FIELDS}
+        # incremented on every change (ours or caught up from another worker), see the version property.
+        self._version = 0
+
+        self.load()
+
+    def load(self):
+        with self.lock:
+            replayed = self._load_files()
+            self._journal = open(self.journal_path, 'ab')
+            self._pending = replayed
+
+            if replayed:
+                self.compact()
+
+    # Reads students.json + the journal into memory.
+    # New dict and new index lists are swapped in at the end, readers keep using the old ones till then.
+    def _load_files(self):
+        self._file_id = _file_id(self.path)
+        students = load_data(self.path) if os.path.exists(self.path) else {}
+        replayed = 0
+        self._journal_offset = 0
+
+        # replay the changes which were journaled after the last compaction.
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as f:
+                for record, offset in _read_journal(f):
+                    self._apply(students, record)
+                    self._journal_offset = offset
+                    replayed += _record_rows(record)
+            self._drop_torn_tail()
+
+        self._students = students
+        for index in self.indexes.values():
+            index.rebuild(students)
+        return replayed
+
+    # Called by StoreLock right after it got the file lock (only with STUDENTS_FILE_LOCK=1),
+    # for a write or for a read which saw the files change (_refresh).
+    # Another worker may have written to the journal or compacted since we last held the lock,
+    # so we apply its changes before our read-modify-write looks at the data.
+    def _catch_up(self):
+        if self._journal is None: # still loading / already closed
+            return
+
+        if _file_id(self.path) != self._file_id:
+            # students.json was replaced -> another worker compacted and emptied the journal.
+            self._pending = self._load_files()
+            self._version += 1
+            return
+
+        applied = 0
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._journal_offset)
+            for record, offset in _read_journal(f, self._journal_offset):
+                self._apply_record(record)
+                self._journal_offset = offset
+                applied += _record_rows(record)
+        self._drop_torn_tail()
+
+        if applied:
+            self._pending += applied
+            self._version += 1
+
+    # A worker that crashed mid-append leaves half a line at the end of the journal.
+    # Cut it off, otherwise our next record would be glued to it and lost on replay.
+    def _drop_torn_tail(self):
+        if os.path.getsize(self.journal_path) > self._journal_offset:
+            os.truncate(self.journal_path, self._journal_offset)
+
+    # With several workers (STUDENTS_FILE_LOCK=1) another process may have written since we last looked.
+    # Two stat() calls tell us: the journal grew, or students.json was replaced by a compaction.
+    # Only then the reader takes the lock, which catches up (StoreLock -> _catch_up).
+    def _refresh(self):
+        if not self.file_lock or self._journal is None:
+            return
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            journal_size = None
+        if journal_size != self._journal_offset or _file_id(self.path) != self._file_id:
+            with self.lock:
+                pass
+
+    # used for the ETag of the read endpoints (see http_cache.py), so it has to include
+    # the changes of the other workers too.
+    @property
+    def version(self):
+        self._refresh()
+        return self._version
+
+    # Read operations - served from memory, no lock unless the files changed (see _refresh).
+    # A write never changes a student dict in place, it puts a new dict in (and a reload swaps in
+    # a whole new roster), so a reader sees either the old or the new version of a student, never half of it.
+    def get(self, student_id, default=None):
+        self._refresh()
+        return self._students.get(student_id, default)
+
+    def all(self):
+        self._refresh()
+        # shallow copy, so callers can't change the store by mistake.
+        return dict(self._students)
+
+    def items(self):
+        self._refresh()
+        return self._students.items()
+
+    def values(self):
+        self._refresh()
+        return self._students.values()
+
+    # Returns a list of (index entry, student) for one page.
+    # The entry of the last student is what goes into the cursor for the next page.
+    def page(self, field, order='asc', offset=0, limit=None, after=None):
+        self._refresh()
+        page = []
+        for entry in self.indexes[field].page(order, offset, limit, after):
+            student = self._students.get(entry[1])
+            if student is not None: # a student deleted after we took the entries gets skipped.
+                page.append((entry, student))
+        return page
+
+    # Same as StudentRepository.iterate, but walks the index directly instead of building pages.
+    def iterate(self, field, order='asc', after=None, limit=None, chunk_size=500, offset=0):
+        self._refresh()
+        index = self.indexes[field]
+        while limit is None or limit > 0:
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            entries = index.page(order, offset, limit=size, after=after)
+            offset = 0
+            if not entries:
+                return
+
+            for entry in entries:
+                student = self._students.get(entry[1])
+                if student is not None:
+                    yield entry, student
+
+            after = entries[-1]
+            if limit is not None:
+                limit -= len(entries)
+
+    def __contains__(self, student_id):
+        self._refresh()
+        return student_id in self._students
+
+    def __len__(self):
+        self._refresh()
+        return len(self._students)
+
+    # Write operations - journal first, then update the memory.
+    def put(self, student_id, student):
+        with self.lock:
+            self._commit({"op": "put", "id": student_id, "student": student})
+
+    # Many students in one journal record (one line, one fsync).
+    # A crash can't leave half of the batch saved: a half written line is ignored on replay.
+    def put_many(self, students):
+        with self.lock:
+            self._commit({"op": "put_many", "students": students})
+
+    def delete(self, student_id):
+        with self.lock:
+            self._commit({"op": "delete", "id": student_id})
+
+    def compact(self):
+        # Write the full roster into students.json and empty the journal.
+        # If we crash between these two steps, the journal gets replayed again on the next start,
+        # which is safe because every record says what the final value is (put/delete), not a delta.
+        with self.lock:
+            save_data(self._students, self.path)
+            self._file_id = _file_id(self.path)
+            # truncate instead of reopening with 'wb': the handle must stay in append mode,
+            # other workers append to the same journal file.
+            self._journal.truncate(0)
+            self._journal_offset = 0
+            self._pending = 0
+
+    def close(self):
+        with self.lock:
+            if self._journal is None:
+                return
+            if self._pending:
+                self.compact()
+            self._journal.close()
+            self._journal = None
+            self.lock.close()
+
+    def _append(self, record):
+        self._journal.write(fast_json.dumps(record) + b"\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno()) # the change is on disk before we reply to the client.
+        self._journal_offset = self._journal.tell()
+        self._pending += _record_rows(record)
+
+    def _commit(self, record):
+        self._append(record)
+        self._apply_record(record)
+        self._version += 1
+        self._maybe_compact()
+
+    # Applies one record to the memory, indexes first.
+    def _apply_record(self, record):
+        if record["op"] == "put":
+            self._update_indexes(record["id"], self._students.get(record["id"]), record["student"])
+        elif record["op"] == "put_many":
+            for student_id, student in record["students"].items():
+                self._update_indexes(student_id, self._students.get(student_id), student)
+        elif record["op"] == "delete":
+            self._update_indexes(record["id"], self._students.get(record["id"]), None)
+        self._apply(self._students, record)
+
+    def _update_indexes(self, student_id, old_student, new_student):
+        for index in self.indexes.values():
+            if old_student is not None:
+                index.remove(student_id, old_student)
+            if new_student is not None:
+                index.add(student_id, new_student)
+
+    def _maybe_compact(self):
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    @staticmethod
+    def _apply(students, record):
+        if record["op"] == "put":
+            students[record["id"]] = record["student"]
+        elif record["op"] == "put_many":
+            students.update(record["students"])
+        elif record["op"] == "delete":
+            students.pop(record["id"], None)
+
+
+# Yields (record, offset right after it) for every complete journal line.
+# Stops at the first line without "\n" or with broken JSON (process crashed mid-append).
+def _read_journal(f, offset=0):
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        try:
+            record = fast_json.loads(line)
+        except ValueError: # json.JSONDecodeError / orjson.JSONDecodeError
+            return
+        offset += len(line)
+        yield record, offset
+
+# no. of students a journal record changes.
+def _record_rows(record):
+    return len(record["students"]) if record["op"] == "put_many" else 1
+
+# Changes whenever students.json is replaced (os.replace in save_data gives it a new inode).
+def _file_id(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
@@ -0,0 +1,223 @@
+# SQL backend for the students API (STUDENTS_BACKEND=sqlite, see student_repository.py).
+# Students live in a "students" table, sorting and paging is done by the database:
+# ORDER BY <field>, id LIMIT n, and the cursor becomes WHERE (<field>, id) > (value, id),
+# both served from the (field, id) indexes, so a page costs the same no matter how deep it is.
+#
+# python student_store_sql.py import [students.json] -> copies the students of the json file into the table.
+import os
+import sys
+import threading
+from sqlalchemy import MetaData, Table, Column, Integer, String, LargeBinary, Index
+from sqlalchemy import select, insert, update, delete, func, tuple_
+from sqlalchemy.exc import IntegrityError
+from db import get_engine, iter_batches, BULK_BATCH_SIZE
+import fast_json
+from student_repository import StudentRepository, SORTABLE_FIELDS
+
+STUDENTS_DATABASE_URL = os.environ.get("STUDENTS_DATABASE_URL", "sqlite:///./students.db")
+
+metadata = MetaData()
+
+students = Table(
+    "students",
+    metadata,
+    Column("id", String(50), primary_key=True),
+    # copies of the sortable fields, the only ones the database has to look at.
+    Column("problems_solved", Integer, nullable=False, server_default="0"),
+    Column("passout_year", Integer, nullable=False, server_default="0"),
+    # the complete student (without id) as JSON, sent back as it is.
+    Column("data", LargeBinary, nullable=False),
+    # id is the tie breaker of the sort order and part of the cursor, so it is in the index too.
+    Index("ix_students_problems_solved_id", "problems_solved", "id"),
+    Index("ix_students_passout_year_id", "passout_year", "id")
+)
+
+# single row (id = 1) with the version of the students table, bumped by every write.
+# It is in the database and not in memory, so every worker sees the same version (ETag).
+students_meta = Table(
+    "students_meta",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False)
+)
+
+META_ROW = students_meta.c.id == 1
+
+
+# `with store.lock:` for the SQL backend = one transaction.
+# The first statement is a write on the meta row, which takes the database write lock
+# (SQLite: the RESERVED lock, others: the row lock), so read-modify-write cycles of different
+# threads and workers take turns. Everything the same thread does inside the `with`
+# (get, `in`, put, ...) runs on this transaction's connection.
+class TransactionLock:
+    def __init__(self, engine):
+        self._engine = engine
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        return getattr(self._local, "connection", None)
+
+    def __enter__(self):
+        local = self._local
+        if getattr(local, "depth", 0) == 0:
+            local.transaction = self._engine.begin()
+            local.connection = local.transaction.__enter__()
+            try:
+                local.connection.execute(update(students_meta).where(META_ROW).values(version=students_meta.c.version))
+            except BaseException as e:
+                self._end(type(e), e, e.__traceback__)
+                raise
+            local.depth = 0
+        local.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            return self._end(*exc_info)
+
+    # commit (or rollback if there was an exception) and give the connection back to the pool.
+    def _end(self, *exc_info):
+        transaction = self._local.transaction
+        self._local.transaction = self._local.connection = None
+        return transaction.__exit__(*exc_info)
+
+
+class SqlStudentStore(StudentRepository):
+    def __init__(self, url=STUDENTS_DATABASE_URL, batch_size=BULK_BATCH_SIZE):
+        self.engine = get_engine(url)
+        self.batch_size = batch_size
+        self.lock = TransactionLock(self.engine)
+
+        metadata.create_all(self.engine)
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(students_meta).values(id=1, version=0))
+        except IntegrityError: # already there (or another worker was faster)
+            pass
+
+    def _connect(self):
+        # inside `with store.lock:` -> use its transaction.
+        if self.lock.connection is not None:
+            return _Borrowed(self.lock.connection)
+        return self.engine.connect()
+
+    # Read operations
+    @property
+    def version(self):
+        with self._connect() as conn:
+            return conn.execute(select(students_meta.c.version).where(META_ROW)).scalar_one()
+
+    def get(self, student_id, default=None):
+        with self._connect() as conn:
+            data = conn.execute(select(students.c.data).where(students.c.id == student_id)).scalar()
+        return default if data is None else fast_json.loads(data)
+
+    def __contains__(self, student_id):
+        with self._connect() as conn:
+            return conn.execute(select(students.c.id).where(students.c.id == student_id)).first() is not None
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute(select(func.count()).select_from(students)).scalar_one()
+
+    def all(self):
+        with self._connect() as conn:
+            rows = conn.execute(select(students.c.id, students.c.data).order_by(students.c.id))
+            return {student_id: fast_json.loads(data) for student_id, data in rows}
+
+    def page(self, field, order='asc', offset=0, limit=None, after=None):
+        id_column = students.c.id
+        if field == 'id':
+            key, after_key = id_column, (None if after is None else after[1])
+        elif field in SORTABLE_FIELDS:
+            key, after_key = tuple_(students.c[field], id_column), after
+        else:
+            raise ValueError(f"Can't sort students by {field!r}.")
+
+        value_column = id_column if field == 'id' else students.c[field]
+        query = select(value_column, id_column, students.c.data)
+
+        # keyset pagination: start right after the cursor entry.
+        if order == 'desc':
+            if after_key is not None:
+                query = query.where(key < after_key)
+            query = query.order_by(value_column.desc(), id_column.desc())
+        else:
+            if after_key is not None:
+                query = query.where(key > after_key)
+            query = query.order_by(value_column, id_column)
+
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(query).all()
+        return [((value, student_id), fast_json.loads(data)) for value, student_id, data in rows]
+
+    # Write operations - each one is a transaction (or part of the `with store.lock:` one)
+    # and bumps the version in the same transaction.
+    def put(self, student_id, student):
+        with self.lock:
+            conn = self.lock.connection
+            conn.execute(delete(students).where(students.c.id == student_id))
+            conn.execute(insert(students), [_row(student_id, student)])
+            self._bump_version(conn)
+
+    def put_many(self, new_students):
+        with self.lock:
+            conn = self.lock.connection
+            for batch in iter_batches(new_students.items(), self.batch_size):
+                conn.execute(delete(students).where(students.c.id.in_([student_id for student_id, _ in batch])))
+                conn.execute(insert(students), [_row(student_id, student) for student_id, student in batch])
+            self._bump_version(conn)
+
+    def delete(self, student_id):
+        with self.lock:
+            conn = self.lock.connection
+            conn.execute(delete(students).where(students.c.id == student_id))
+            self._bump_version(conn)
+
+    def close(self):
+        self.engine.dispose()
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute(update(students_meta).where(META_ROW).values(version=students_meta.c.version + 1))
+
+
+# missing sort value = 0, same as the json backend's SortedIndex.
+def _row(student_id, student):
+    row = {"id": student_id, "data": fast_json.dumps(student)}
+    for field in SORTABLE_FIELDS:
+        row[field] = student.get(field, 0)
+    return row
+
+# Connection of the lock's transaction used in a `with` block -> must not be closed at the end of it.
+class _Borrowed:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+if __name__ == "__main__":
+    from student_store import load_data, STUDENTS_FILE
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "import":
+        path = sys.argv[2] if len(sys.argv) > 2 else STUDENTS_FILE
+        roster = load_data(path)
+        store = SqlStudentStore()
+        store.put_many(roster)
+        print(f"Imported {len(roster)} student(s) from {path}, the table now has {len(store)}.")
+    else:
+        print("usage: python student_store_sql.py import [students.json]")
+        sys.exit(2)
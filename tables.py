@@ -1,6 +1,7 @@
 # Create Tables.
 from db import engine
-from sqlalchemy import MetaData, Table, Column, Integer, String, ForeignKey
+from post_count import attach_post_count_triggers
+from sqlalchemy import MetaData, Table, Column, Integer, String, ForeignKey, Index
 
 metadata = MetaData()
 
@@ -12,7 +13,10 @@ users = Table(
     Column("name", String(50), nullable=False),
     Column("email", String(50), nullable=False, unique=True),
     Column("address", String(100), nullable=False),
-    Column("phone_number", Integer, nullable=False)
+    Column("phone_number", Integer, nullable=False),
+    # no. of posts of the user, kept in sync by triggers on posts (see post_count.py).
+    Column("post_count", Integer, nullable=False, server_default="0"),
+    Index("ix_users_post_count", "post_count")
 )
 
 posts = Table(
@@ -20,8 +24,11 @@ posts = Table(
     metadata,
     Column("id", Integer, primary_key=True),
     Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
-    Column("content", String(500), nullable=False)
+    Column("content", String(500), nullable=False),
+    # used for "posts of a user" lookups (WHERE user_id = ? / IN (...)).
+    Index("ix_posts_user_id", "user_id")
 )
+attach_post_count_triggers(posts)
 
 def create_tables():
     metadata.create_all(engine)
\ No newline at end of file